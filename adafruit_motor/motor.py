@@ -20,15 +20,22 @@ factors already.
 * Author(s): Scott Shawcroft
 """
 
+import time
+from array import array
+
 try:
     from types import TracebackType
-    from typing import Optional, Type
+    from typing import Optional, Sequence, Tuple, Type, Union
+
+    from adafruit_motor.stats import Stats
 
     try:
         from pwmio import PWMOut
     except NotImplementedError:
         from circuitpython_typing.pwmio import PWMOut
 
+    from countio import Counter
+
 except ImportError:
     pass
 
@@ -41,6 +48,35 @@ FAST_DECAY = 0
 SLOW_DECAY = 1
 """Recirculation current slow decay mode (braking)"""
 
+# Seconds between throttle changes while ramping.
+_RAMP_PERIOD = 0.02
+
+
+def _build_throttle_table(
+    resolution: int, decay_mode: int, deadband: float, min_duty: float, expo: float
+) -> array:
+    """Returns the positive and negative duty cycle for every throttle from -1.0 to 1.0 in
+    steps of ``1 / resolution``, one after the other."""
+    table = array("H", [0] * (2 * (2 * resolution + 1)))
+    for i in range(-resolution, resolution + 1):
+        magnitude = abs(i) / resolution
+        if magnitude <= deadband:
+            duty_cycle = 0
+        else:
+            value = (magnitude - deadband) / (1 - deadband)
+            value = (1 - expo) * value + expo * value * value * value
+            duty_cycle = int(0xFFFF * (min_duty + (1 - min_duty) * value))
+        if decay_mode == SLOW_DECAY:
+            positive, negative = 0xFFFF, 0xFFFF - duty_cycle
+        else:
+            positive, negative = duty_cycle, 0
+        if i < 0:
+            positive, negative = negative, positive
+        index = 2 * (i + resolution)
+        table[index] = positive
+        table[index + 1] = negative
+    return table
+
 
 class DCMotor:
     """DC motor driver. ``positive_pwm`` and ``negative_pwm`` can be swapped if the motor runs in
@@ -58,13 +94,48 @@ class DCMotor:
     :param ~pwmio.PWMOut positive_pwm: The motor input that causes the motor to spin forwards
       when high and the other is low.
     :param ~pwmio.PWMOut negative_pwm: The motor input that causes the motor to spin backwards
-      when high and the other is low."""
+      when high and the other is low.
+
+    If both PWMs have a ``set_duty_cycles(outputs, duty_cycles)`` method, it is called on
+    ``positive_pwm`` with both PWMs and their new duty cycles instead of setting each
+    ``duty_cycle`` separately. This lets a driver, such as one for a PCA9685, commit both
+    channels in one bus transaction."""
 
     def __init__(self, positive_pwm: PWMOut, negative_pwm: PWMOut) -> None:
         self._positive = positive_pwm
         self._negative = negative_pwm
         self._throttle = None
         self._decay_mode = FAST_DECAY
+        # Throttle that update() slews toward, in throttle per second, and when it last did.
+        self._target = None
+        self._slew_rate = None
+        self._slewed_ns = 0
+        # Throttle to duty cycle lookup table, and the arguments to rebuild it with.
+        self._throttle_table = None
+        self._throttle_curve = None
+        # The last duty cycles written to the PWMs, used to skip writes that change nothing.
+        self._duty_cycles = [None, None]
+        # Commit both duty cycles at once when the PWMs support it.
+        if hasattr(positive_pwm, "set_duty_cycles") and hasattr(negative_pwm, "set_duty_cycles"):
+            self._batch_write = positive_pwm.set_duty_cycles
+        else:
+            self._batch_write = None
+        self._stats = None
+
+    def _set_duty_cycles(self, positive: int, negative: int) -> None:
+        duty_cycles = self._duty_cycles
+        if self._batch_write is not None:
+            if duty_cycles[0] != positive or duty_cycles[1] != negative:
+                duty_cycles[0] = positive
+                duty_cycles[1] = negative
+                self._batch_write((self._positive, self._negative), (positive, negative))
+            return
+        if duty_cycles[0] != positive:
+            self._positive.duty_cycle = positive
+            duty_cycles[0] = positive
+        if duty_cycles[1] != negative:
+            self._negative.duty_cycle = negative
+            duty_cycles[1] = negative
 
     @property
     def throttle(self) -> Optional[float]:
@@ -78,28 +149,174 @@ class DCMotor:
     def throttle(self, value: Optional[float]) -> None:
         if value is not None and (value > 1.0 or value < -1.0):
             raise ValueError("Throttle must be None or between -1.0 and +1.0")
+        self._target = value
+        self._set_throttle(value)
+
+    def _set_throttle(self, value: Optional[float]) -> None:
         self._throttle = value
+        positive, negative = self._throttle_duty_cycles(value)
+        self._set_duty_cycles(positive, negative)
+
+    def _throttle_duty_cycles(self, value: Optional[float]) -> Tuple[int, int]:
+        # The positive and negative duty cycles for a throttle.
         if value is None:  # Turn off motor controller (high-Z)
-            self._positive.duty_cycle = 0
-            self._negative.duty_cycle = 0
-        elif value == 0:  # Brake motor (low-Z)
-            self._positive.duty_cycle = 0xFFFF
-            self._negative.duty_cycle = 0xFFFF
+            return (0, 0)
+        if value == 0:  # Brake motor (low-Z)
+            return (0xFFFF, 0xFFFF)
+        if self._throttle_table is not None:
+            table = self._throttle_table
+            resolution = self._throttle_curve[0]
+            index = 2 * (int(value * resolution) + resolution)
+            return (table[index], table[index + 1])
+        duty_cycle = int(0xFFFF * abs(value))
+        if self._decay_mode == SLOW_DECAY:  # Slow Decay (Braking) Mode
+            positive, negative = 0xFFFF, 0xFFFF - duty_cycle
         else:
-            duty_cycle = int(0xFFFF * abs(value))
-            if self._decay_mode == SLOW_DECAY:  # Slow Decay (Braking) Mode
-                if value < 0:
-                    self._positive.duty_cycle = 0xFFFF - duty_cycle
-                    self._negative.duty_cycle = 0xFFFF
-                else:
-                    self._positive.duty_cycle = 0xFFFF
-                    self._negative.duty_cycle = 0xFFFF - duty_cycle
-            elif value < 0:
-                self._positive.duty_cycle = 0
-                self._negative.duty_cycle = duty_cycle
-            else:
-                self._positive.duty_cycle = duty_cycle
-                self._negative.duty_cycle = 0
+            positive, negative = duty_cycle, 0
+        if value < 0:
+            return (negative, positive)
+        return (positive, negative)
+
+    def set_throttle_curve(
+        self,
+        resolution: Optional[int] = 256,
+        *,
+        deadband: float = 0.0,
+        min_duty: float = 0.0,
+        expo: float = 0.0,
+    ) -> None:
+        """Precomputes the duty cycles for ``resolution`` throttle steps in each direction, so
+        setting `throttle` is a table lookup. Throttles are rounded toward zero to the nearest
+        step. The table also shapes the throttle to suit the motor.
+
+        .. code-block:: python
+
+            # The motor does not turn below 30% duty cycle and jitters around 0.
+            motor.set_throttle_curve(deadband=0.05, min_duty=0.3)
+
+        :param int resolution: Throttle steps from 0.0 to 1.0, or ``None`` to remove the table
+          and calculate duty cycles exactly
+        :param float deadband: Throttles up to this magnitude give no drive
+        :param float min_duty: Duty cycle, from 0.0 to 1.0, of the smallest throttle outside the
+          deadband. Motors often need some duty cycle to start turning at all.
+        :param float expo: From 0.0 for a linear response to 1.0 for a cubic one that gives
+          finer control at low throttle"""
+        if resolution is None:
+            self._throttle_table = None
+            self._throttle_curve = None
+            return
+        if resolution < 1:
+            raise ValueError("Resolution must be at least 1")
+        if not (0.0 <= deadband < 1.0 and 0.0 <= min_duty <= 1.0 and 0.0 <= expo <= 1.0):
+            raise ValueError("Deadband must be 0.0 to below 1.0, min_duty and expo 0.0 to 1.0")
+        self._throttle_curve = (resolution, deadband, min_duty, expo)
+        self._throttle_table = _build_throttle_table(
+            resolution, self._decay_mode, deadband, min_duty, expo
+        )
+
+    @property
+    def slew_rate(self) -> Optional[float]:
+        """Maximum change of `throttle` per second when setting `target_throttle`, or ``None``
+        to change it at once. A full reverse to full forward change at a rate of ``4.0`` takes
+        half a second. Limiting it avoids the current spikes of sudden changes. Setting it to
+        ``None`` during a ramp jumps to `target_throttle`."""
+        return self._slew_rate
+
+    @slew_rate.setter
+    def slew_rate(self, rate: Optional[float]) -> None:
+        if rate is not None and rate <= 0:
+            raise ValueError("Slew rate must be None or positive")
+        self._slew_rate = rate
+        if rate is None and self._target != self._throttle:
+            self.throttle = self._target
+
+    @property
+    def target_throttle(self) -> Optional[float]:
+        """The throttle that `update` changes `throttle` toward at `slew_rate`. Ramps up from
+        ``0.0`` if the controller is off. Setting it to ``None``, or setting it without a
+        `slew_rate`, changes `throttle` at once. Setting `throttle` sets it too."""
+        return self._target
+
+    @target_throttle.setter
+    def target_throttle(self, value: Optional[float]) -> None:
+        if value is None or self._slew_rate is None:
+            self.throttle = value
+            return
+        if value > 1.0 or value < -1.0:
+            raise ValueError("Throttle must be None or between -1.0 and +1.0")
+        if self._target == self._throttle:
+            # Not ramping yet, so start timing from now.
+            self._slewed_ns = time.monotonic_ns()
+        self._target = value
+
+    def update(self, now: Optional[int] = None) -> bool:
+        """Moves `throttle` toward `target_throttle` by as much as `slew_rate` allows for the
+        time since the last call. Call this as often as possible from the main loop. The PWMs
+        are only written when their duty cycles change.
+
+        :param int now: The current `time.monotonic_ns`, to share one reading between motors
+        :return: ``True`` while `throttle` has not reached `target_throttle`"""
+        target = self._target
+        throttle = self._throttle
+        if target == throttle:
+            return False
+        if now is None:
+            now = time.monotonic_ns()
+        change = self._slew_rate * (now - self._slewed_ns) / 1000000000
+        self._slewed_ns = now
+        if throttle is None:
+            throttle = 0.0
+        if target > throttle:
+            throttle = min(target, throttle + change)
+        else:
+            throttle = max(target, throttle - change)
+        self._set_throttle(throttle)
+        return throttle != target
+
+    def resync(self) -> None:
+        """Writes the current duty cycle of both PWMs again. Unchanged duty cycles are normally
+        skipped, so call this if the PWMs were reset or changed outside of this object."""
+        positive, negative = self._duty_cycles
+        if positive is None:  # Nothing has been written yet
+            return
+        if self._batch_write is not None:
+            self._batch_write((self._positive, self._negative), (positive, negative))
+        else:
+            self._positive.duty_cycle = positive
+            self._negative.duty_cycle = negative
+
+    @property
+    def stats(self) -> Optional["Stats"]:
+        """The `adafruit_motor.stats.Stats` being recorded, or ``None`` if `enable_stats` has
+        not been called."""
+        return self._stats
+
+    def enable_stats(self) -> "Stats":
+        """Starts recording duty cycle updates and hardware writes into a new
+        `adafruit_motor.stats.Stats`. Until this is called no time is spent recording anything.
+
+        :return: The new `stats`"""
+        from adafruit_motor.stats import Stats, _CountedOutput
+
+        self.disable_stats()
+        stats = Stats()
+        self._uninstrumented = (self._positive, self._negative, self._batch_write)
+        if self._batch_write is not None:
+            self._batch_write = stats._counted(self._batch_write)
+        else:
+            self._positive = _CountedOutput(self._positive, stats)
+            self._negative = _CountedOutput(self._negative, stats)
+        self._set_duty_cycles = stats._timed(self._set_duty_cycles)
+        self._stats = stats
+        return stats
+
+    def disable_stats(self) -> None:
+        """Stops recording `stats` and removes the instrumentation."""
+        if self._stats is None:
+            return
+        self._positive, self._negative, self._batch_write = self._uninstrumented
+        del self._set_duty_cycles
+        self._stats = None
 
     @property
     def decay_mode(self) -> int:
@@ -112,9 +329,35 @@ class DCMotor:
     def decay_mode(self, mode: int = FAST_DECAY) -> None:
         if mode in {FAST_DECAY, SLOW_DECAY}:
             self._decay_mode = mode
+            if self._throttle_curve is not None:
+                resolution, deadband, min_duty, expo = self._throttle_curve
+                self._throttle_table = _build_throttle_table(
+                    resolution, mode, deadband, min_duty, expo
+                )
         else:
             raise ValueError("Decay mode value must be either motor.FAST_DECAY or motor.SLOW_DECAY")
 
+    async def ramp_to(self, throttle: float, duration: float) -> None:
+        """Changes `throttle` linearly to ``throttle`` over ``duration`` seconds as an `asyncio`
+        coroutine, sleeping between changes so other tasks can run. Ramps up from ``0.0`` if the
+        controller is off.
+
+        :param float throttle: Final throttle, from -1.0 to 1.0
+        :param float duration: Length of the ramp in seconds"""
+        import asyncio
+
+        if throttle is None or throttle > 1.0 or throttle < -1.0:
+            raise ValueError("Throttle must be between -1.0 and +1.0")
+        start = self._throttle or 0.0
+        start_ns = time.monotonic_ns()
+        duration_ns = int(duration * 1000000000)
+        elapsed_ns = 0
+        while elapsed_ns < duration_ns:
+            self.throttle = start + (throttle - start) * elapsed_ns / duration_ns
+            await asyncio.sleep(_RAMP_PERIOD)
+            elapsed_ns = time.monotonic_ns() - start_ns
+        self.throttle = throttle
+
     def __enter__(self) -> "DCMotor":
         return self
 
@@ -125,3 +368,538 @@ class DCMotor:
         traceback: Optional[TracebackType],
     ) -> None:
         self.throttle = None
+
+
+class MotorGroup:
+    """Drives several `DCMotor` objects together, such as the wheels of a robot. All of the
+    duty cycles are worked out first and then written back to back, so the motors change speed
+    together. Motors whose PWMs have equal ``set_duty_cycles(outputs, duty_cycles)`` methods
+    share a driver, and each driver's method is called once with all of its PWMs and their duty
+    cycles.
+
+    :param DCMotor motors: The motors to drive
+    :param inverted: Whether each motor is mounted so that it turns the other way, or ``None``
+      if none are
+    :param trim: A factor from 0.0 to 1.0 for each motor's throttle that evens out the speeds of
+      mismatched motors, or ``None`` for no trim"""
+
+    def __init__(
+        self,
+        *motors: DCMotor,
+        inverted: Optional[Sequence[bool]] = None,
+        trim: Optional[Sequence[float]] = None,
+    ) -> None:
+        count = len(motors)
+        if count == 0:
+            raise ValueError("Need at least one motor")
+        if inverted is None:
+            inverted = (False,) * count
+        if trim is None:
+            trim = (1.0,) * count
+        if len(inverted) != count or len(trim) != count:
+            raise ValueError("Need one inverted and trim value per motor")
+        for factor in trim:
+            if not 0.0 < factor <= 1.0:
+                raise ValueError("Trim must be above 0.0 and at most 1.0")
+        self._motors = motors
+        # Each motor's throttle is the group's throttle times its scale.
+        self._scales = tuple(-trim[i] if inverted[i] else trim[i] for i in range(count))
+        self._throttles = [None] * count
+        self._duty_cycles = [0] * (2 * count)
+        # Motors that share a driver are written in one batch and the rest one at a time.
+        drivers = []
+        for i, motor in enumerate(motors):
+            if motor._batch_write is not None:
+                for write, indices in drivers:
+                    if write == motor._batch_write:
+                        indices.append(i)
+                        break
+                else:
+                    drivers.append((motor._batch_write, [i]))
+        self._batches = tuple(
+            (
+                write,
+                tuple(indices),
+                tuple(pwm for i in indices for pwm in (motors[i]._positive, motors[i]._negative)),
+                [0] * (2 * len(indices)),
+            )
+            for write, indices in drivers
+            if len(indices) > 1
+        )
+        batched = [i for batch in self._batches for i in batch[1]]
+        self._unbatched = tuple(i for i in range(count) if i not in batched)
+
+    @property
+    def throttle(self) -> Optional[float]:
+        """The throttle of the first motor before inversion and trim. Setting it sets every
+        motor to the same throttle. See `DCMotor.throttle`."""
+        return self._throttles[0]
+
+    @throttle.setter
+    def throttle(self, value: Optional[float]) -> None:
+        self.set_throttles((value,) * len(self._motors))
+
+    def set_throttles(self, throttles: Sequence[Optional[float]]) -> None:
+        """Sets the throttle of each motor at once.
+
+        :param throttles: One throttle for each motor, before inversion and trim"""
+        if len(throttles) != len(self._motors):
+            raise ValueError("Need one throttle per motor")
+        for i, value in enumerate(throttles):
+            if value is not None and (value > 1.0 or value < -1.0):
+                raise ValueError("Throttle must be None or between -1.0 and +1.0")
+            self._throttles[i] = value
+        self._commit()
+
+    def _commit(self) -> None:
+        duty_cycles = self._duty_cycles
+        for i, motor in enumerate(self._motors):
+            throttle = self._throttles[i]
+            if throttle is not None:
+                throttle *= self._scales[i]
+            motor._throttle = throttle
+            motor._target = throttle
+            positive, negative = motor._throttle_duty_cycles(throttle)
+            duty_cycles[2 * i] = positive
+            duty_cycles[2 * i + 1] = negative
+        for i in self._unbatched:
+            self._motors[i]._set_duty_cycles(duty_cycles[2 * i], duty_cycles[2 * i + 1])
+        for write, indices, outputs, batch in self._batches:
+            changed = False
+            for j, i in enumerate(indices):
+                positive = duty_cycles[2 * i]
+                negative = duty_cycles[2 * i + 1]
+                written = self._motors[i]._duty_cycles
+                if written[0] != positive or written[1] != negative:
+                    written[0] = positive
+                    written[1] = negative
+                    changed = True
+                batch[2 * j] = positive
+                batch[2 * j + 1] = negative
+            if changed:
+                write(outputs, batch)
+
+    def __enter__(self) -> "MotorGroup":
+        return self
+
+    def __exit__(
+        self,
+        exception_type: Optional[Type[type]],
+        exception_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.throttle = None
+
+
+class DifferentialDrive(MotorGroup):
+    """Drives the left and right wheels of a robot that steers by turning them at different
+    speeds, with tank or arcade style control.
+
+    .. code-block:: python
+
+        drive = DifferentialDrive((left_front, left_back), (right_front, right_back))
+        drive.arcade(0.5, 0.2)  # Forward at half speed while turning right
+
+    :param left: The left motor or motors
+    :param right: The right motor or motors
+    :param inverted: Whether each motor, left ones first, turns the other way. Often the motors
+      on one side are mounted the other way around.
+    :param trim: A factor from 0.0 to 1.0 for each motor's throttle, left ones first. See
+      `MotorGroup`."""
+
+    def __init__(
+        self,
+        left: Union[DCMotor, Sequence[DCMotor]],
+        right: Union[DCMotor, Sequence[DCMotor]],
+        *,
+        inverted: Optional[Sequence[bool]] = None,
+        trim: Optional[Sequence[float]] = None,
+    ) -> None:
+        if isinstance(left, DCMotor):
+            left = (left,)
+        if isinstance(right, DCMotor):
+            right = (right,)
+        super().__init__(*(tuple(left) + tuple(right)), inverted=inverted, trim=trim)
+        self._left_count = len(left)
+
+    def tank(self, left: Optional[float], right: Optional[float]) -> None:
+        """Sets the throttle of each side.
+
+        :param float left: Throttle of the left motors, from -1.0 to 1.0
+        :param float right: Throttle of the right motors, from -1.0 to 1.0"""
+        for value in (left, right):
+            if value is not None and (value > 1.0 or value < -1.0):
+                raise ValueError("Throttle must be None or between -1.0 and +1.0")
+        throttles = self._throttles
+        for i in range(len(throttles)):
+            throttles[i] = left if i < self._left_count else right
+        self._commit()
+
+    def arcade(self, speed: float, turn: float) -> None:
+        """Drives forward or backward while turning. When the sum of both is more than full
+        throttle, both sides are scaled down so the robot still turns at the same rate.
+
+        :param float speed: Throttle forward, from -1.0 to 1.0
+        :param float turn: Throttle difference between the sides, from -1.0 to 1.0. Positive
+          turns right."""
+        if not (-1.0 <= speed <= 1.0 and -1.0 <= turn <= 1.0):
+            raise ValueError("Speed and turn must be between -1.0 and +1.0")
+        left = speed + turn
+        right = speed - turn
+        largest = max(abs(left), abs(right))
+        if largest > 1.0:
+            left /= largest
+            right /= largest
+        self.tank(left, right)
+
+
+class _EncoderLoop:
+    """Shared base class of the closed loop controllers. It runs a PID loop at a fixed rate from
+    `update` and keeps statistics of the loop period. Subclasses supply ``_control(dt)``, which
+    runs one step of the loop and returns whether the controller still has work to do."""
+
+    def __init__(
+        self,
+        motor: DCMotor,
+        encoder: "Counter",
+        *,
+        kp: float,
+        ki: float,
+        kd: float,
+        rate: float,
+        max_throttle: float,
+    ) -> None:
+        if rate <= 0:
+            raise ValueError("Rate must be positive")
+        if not 0.0 < max_throttle <= 1.0:
+            raise ValueError("Maximum throttle must be above 0.0 and at most 1.0")
+        self._motor = motor
+        self._encoder = encoder
+        # rotaryio.IncrementalEncoder has a position and countio.Counter has a count.
+        self._attribute = "position" if hasattr(encoder, "position") else "count"
+        self.kp = kp
+        """Proportional gain in throttle per count, or per count per second for velocity.
+
+        :type: float
+        """
+        self.ki = ki
+        """Integral gain.
+
+        :type: float
+        """
+        self.kd = kd
+        """Derivative gain.
+
+        :type: float
+        """
+        self._max_throttle = max_throttle
+        self._period_ns = int(1000000000 / rate)
+        self._running = False
+        # What update() returns until the next loop.
+        self._busy = False
+        self._next_ns = 0
+        self._last_ns = 0
+        self._count = getattr(encoder, self._attribute)
+        self._velocity = 0.0
+        self._integral = 0.0
+        self._previous = 0.0
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        """Clears the loop statistics."""
+        self.loops = 0
+        """Number of times the loop has run.
+
+        :type: int
+        """
+        self.overruns = 0
+        """Number of times `update` was called too late to run the loop within one period of
+        when it was due.
+
+        :type: int
+        """
+        self.min_period = None
+        """Shortest time between loops in nanoseconds, or ``None`` before the second loop.
+
+        :type: int
+        """
+        self.max_period = 0
+        """Longest time between loops in nanoseconds.
+
+        :type: int
+        """
+        self._total_period = 0
+
+    @property
+    def mean_period(self) -> Optional[float]:
+        """Average time between loops in nanoseconds, or ``None`` before the second loop."""
+        if self.loops < 2:
+            return None
+        return self._total_period / (self.loops - 1)
+
+    @property
+    def velocity(self) -> float:
+        """Encoder counts per second measured by the last loop."""
+        return self._velocity
+
+    def _start(self) -> None:
+        if self._running:
+            return
+        now = time.monotonic_ns()
+        self._count = getattr(self._encoder, self._attribute)
+        self._last_ns = now
+        self._next_ns = now
+        self._velocity = 0.0
+        self._integral = 0.0
+        self._running = True
+        self._busy = True
+
+    def _stop(self) -> None:
+        self._running = False
+        self._busy = False
+        self._motor.throttle = None
+
+    def update(self, now: Optional[int] = None) -> bool:
+        """Runs the loop if it is due. Call this as often as possible from the main loop, at
+        least as often as the loop's rate.
+
+        :param int now: The current `time.monotonic_ns`, to share one reading between motors
+        :return: ``True`` while the controller has work to do"""
+        if not self._running:
+            return False
+        if now is None:
+            now = time.monotonic_ns()
+        if now < self._next_ns:
+            return self._busy
+        self._next_ns += self._period_ns
+        if now >= self._next_ns:
+            # A whole period was missed, so start timing again from now.
+            self.overruns += 1
+            self._next_ns = now + self._period_ns
+        elapsed = now - self._last_ns
+        self._last_ns = now
+        self.loops += 1
+        count = getattr(self._encoder, self._attribute)
+        if elapsed > 0 and self.loops > 1:
+            self._total_period += elapsed
+            if self.min_period is None or elapsed < self.min_period:
+                self.min_period = elapsed
+            self.max_period = max(self.max_period, elapsed)
+            self._velocity = (count - self._count) * 1000000000 / elapsed
+        self._count = count
+        self._busy = self._control(elapsed / 1000000000)
+        return self._busy
+
+    def _pid(self, error: float, measurement: float, dt: float) -> float:
+        # Returns the clamped throttle for an error. The derivative acts on the measurement so
+        #  that changing the target does not kick the output.
+        derivative = 0.0
+        if dt > 0:
+            derivative = (measurement - self._previous) / dt
+        self._previous = measurement
+        integral = self._integral + error * dt
+        output = self.kp * error + self.ki * integral - self.kd * derivative
+        limit = self._max_throttle
+        # Anti-windup: stop integrating while the output is clamped and the error would push it
+        #  further out.
+        if output > limit:
+            output = limit
+            if error > 0:
+                integral = self._integral
+        elif output < -limit:
+            output = -limit
+            if error < 0:
+                integral = self._integral
+        self._integral = integral
+        return output
+
+
+class VelocityController(_EncoderLoop):
+    """Holds a `DCMotor` at a speed measured by an encoder, despite changes in load. A PID loop
+    runs at a fixed rate when `update` is called from the main loop.
+
+    .. code-block:: python
+
+        encoder = rotaryio.IncrementalEncoder(board.D5, board.D6)
+        controller = VelocityController(dc_motor, encoder, kp=0.001, ki=0.01)
+        controller.target = 600  # Counts per second
+        while True:
+            controller.update()
+
+    :param DCMotor motor: The motor to control. A positive throttle must increase the count.
+    :param encoder: Encoder on the motor with a ``position`` like `rotaryio.IncrementalEncoder`,
+      or a ``count`` like `countio.Counter`. Counters that only count up only suit positive
+      targets.
+    :param float kp: Proportional gain in throttle per count per second of error
+    :param float ki: Integral gain in throttle per count of accumulated error
+    :param float kd: Derivative gain in throttle per count per second squared
+    :param float rate: Loops per second
+    :param float max_throttle: Largest throttle magnitude the loop will output"""
+
+    def __init__(
+        self,
+        motor: DCMotor,
+        encoder: "Counter",
+        *,
+        kp: float,
+        ki: float = 0.0,
+        kd: float = 0.0,
+        rate: float = 100,
+        max_throttle: float = 1.0,
+    ) -> None:
+        super().__init__(motor, encoder, kp=kp, ki=ki, kd=kd, rate=rate, max_throttle=max_throttle)
+        self._target = None
+
+    @property
+    def target(self) -> Optional[float]:
+        """Speed to hold in encoder counts per second, or ``None`` to stop the loop and turn the
+        motor off."""
+        return self._target
+
+    @target.setter
+    def target(self, value: Optional[float]) -> None:
+        self._target = value
+        if value is None:
+            self._stop()
+        elif not self._running:
+            self._previous = 0.0
+            self._start()
+
+    def _control(self, dt: float) -> bool:
+        velocity = self._velocity
+        self._motor.throttle = self._pid(self._target - velocity, velocity, dt)
+        return True
+
+
+class PositionController(_EncoderLoop):
+    """Moves a `DCMotor` with an encoder to a position and holds it there, like a servo. A PID
+    loop runs at a fixed rate when `update` is called from the main loop. The position it aims
+    for moves toward the target at up to ``max_velocity``, so long moves do not start at full
+    throttle.
+
+    .. code-block:: python
+
+        encoder = rotaryio.IncrementalEncoder(board.D5, board.D6)
+        controller = PositionController(dc_motor, encoder, kp=0.01, max_velocity=2000)
+        controller.move_to(5000)
+        while controller.update():
+            pass
+
+    :param DCMotor motor: The motor to control. A positive throttle must increase the count.
+    :param encoder: Encoder on the motor with a ``position`` like `rotaryio.IncrementalEncoder`
+    :param float kp: Proportional gain in throttle per count of error
+    :param float ki: Integral gain in throttle per count second of accumulated error
+    :param float kd: Derivative gain in throttle per count per second
+    :param float rate: Loops per second
+    :param float max_throttle: Largest throttle magnitude the loop will output
+    :param float max_velocity: Fastest the aimed for position moves in counts per second, or
+      ``None`` to aim for the target straight away
+    :param int tolerance: Largest error in counts at which the motor counts as in position
+    :param float settle_time: Seconds the motor must stay in position for the move to end
+    :param bool hold: ``True`` to keep holding the position after a move for as long as `update`
+      is called, even though it returns ``False``. ``False`` to brake the motor and stop the
+      loop."""
+
+    def __init__(
+        self,
+        motor: DCMotor,
+        encoder: "Counter",
+        *,
+        kp: float,
+        ki: float = 0.0,
+        kd: float = 0.0,
+        rate: float = 100,
+        max_throttle: float = 1.0,
+        max_velocity: Optional[float] = None,
+        tolerance: int = 0,
+        settle_time: float = 0.1,
+        hold: bool = True,
+    ) -> None:
+        super().__init__(motor, encoder, kp=kp, ki=ki, kd=kd, rate=rate, max_throttle=max_throttle)
+        if max_velocity is not None and max_velocity <= 0:
+            raise ValueError("Maximum velocity must be None or positive")
+        if tolerance < 0 or settle_time < 0:
+            raise ValueError("Tolerance and settle time must not be negative")
+        self._max_velocity = max_velocity
+        self._tolerance = tolerance
+        self._settle_time = settle_time
+        self._hold = hold
+        self._target = None
+        # The position the loop aims for, which moves toward the target.
+        self._setpoint = 0.0
+        self._settled_for = 0.0
+        self._moving = False
+
+    @property
+    def position(self) -> int:
+        """Encoder count read by the last loop."""
+        return self._count
+
+    @property
+    def target(self) -> Optional[int]:
+        """The position of the current or last move, or ``None`` when stopped."""
+        return self._target
+
+    @property
+    def is_moving(self) -> bool:
+        """``True`` until the motor has been within ``tolerance`` of the `target` for
+        ``settle_time``."""
+        return self._moving
+
+    def move_to(self, position: int) -> None:
+        """Starts a move to ``position`` that is played back by calling `update`. Any move in
+        progress is replaced.
+
+        :param int position: Encoder count to move to"""
+        if not self._running:
+            self._start()
+            self._setpoint = self._count
+            self._previous = self._count
+        self._target = position
+        self._settled_for = 0.0
+        self._moving = True
+        self._busy = True
+
+    def stop(self) -> None:
+        """Abandons the move and turns the motor off."""
+        self._target = None
+        self._moving = False
+        self._stop()
+
+    async def move(self, position: int) -> int:
+        """Performs a move like `move_to` as an `asyncio` coroutine, sleeping between loops so
+        other tasks can run.
+
+        :param int position: Encoder count to move to
+        :return: The position at the end of the move"""
+        import asyncio
+
+        self.move_to(position)
+        while self.update():
+            await asyncio.sleep(max(0, self._next_ns - time.monotonic_ns()) / 1000000000)
+        return self._count
+
+    def _control(self, dt: float) -> bool:
+        target = self._target
+        setpoint = self._setpoint
+        if self._max_velocity is None:
+            setpoint = target
+        elif setpoint < target:
+            setpoint = min(target, setpoint + self._max_velocity * dt)
+        else:
+            setpoint = max(target, setpoint - self._max_velocity * dt)
+        self._setpoint = setpoint
+        position = self._count
+        throttle = self._pid(setpoint - position, position, dt)
+        if self._moving:
+            if setpoint == target and abs(target - position) <= self._tolerance:
+                self._settled_for += dt
+                if self._settled_for >= self._settle_time:
+                    self._moving = False
+                    if not self._hold:
+                        self._running = False
+                        throttle = 0
+            else:
+                self._settled_for = 0.0
+        self._motor.throttle = throttle
+        return self._moving
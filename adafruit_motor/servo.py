@@ -12,10 +12,14 @@ loops enable pulse width modulated control to determine position or rotational s
 * Author(s): Scott Shawcroft
 """
 
+import time
+
 try:
     from types import TracebackType
     from typing import Optional, Type
 
+    from adafruit_motor.stats import Stats
+
     try:
         from pwmio import PWMOut
     except NotImplementedError:
@@ -28,6 +32,9 @@ except (ImportError, NotImplementedError):
 __version__ = "0.0.0+auto.0"
 __repo__ = "https://github.com/adafruit/Adafruit_CircuitPython_Motor.git"
 
+# Seconds between angle changes while sweeping, one frame of a typical 50 Hz servo signal.
+_SWEEP_PERIOD = 0.02
+
 
 # We disable the too few public methods check because this is a private base class for the two types
 # of servos.
@@ -40,6 +47,7 @@ class _BaseServo:
 
     def __init__(self, pwm_out: "PWMOut", *, min_pulse: int = 750, max_pulse: int = 2250) -> None:
         self._pwm_out = pwm_out
+        self._stats = None
         self.set_pulse_width_range(min_pulse, max_pulse)
 
     def set_pulse_width_range(self, min_pulse: int = 750, max_pulse: int = 2250) -> None:
@@ -61,13 +69,45 @@ class _BaseServo:
     @fraction.setter
     def fraction(self, value: Optional[float]) -> None:
         if value is None:
-            self._pwm_out.duty_cycle = 0  # disable the motor
+            self._set_duty_cycle(0)  # disable the motor
             return
         if not 0.0 <= value <= 1.0:
             raise ValueError("Must be 0.0 to 1.0")
         duty_cycle = self._min_duty + int(value * self._duty_range)
+        self._set_duty_cycle(duty_cycle)
+
+    def _set_duty_cycle(self, duty_cycle: int) -> None:
         self._pwm_out.duty_cycle = duty_cycle
 
+    @property
+    def stats(self) -> Optional["Stats"]:
+        """The `adafruit_motor.stats.Stats` being recorded, or ``None`` if `enable_stats` has
+        not been called."""
+        return self._stats
+
+    def enable_stats(self) -> "Stats":
+        """Starts recording pulse width updates and hardware writes into a new
+        `adafruit_motor.stats.Stats`. Until this is called no time is spent recording anything.
+
+        :return: The new `stats`"""
+        from adafruit_motor.stats import Stats, _CountedOutput
+
+        self.disable_stats()
+        stats = Stats()
+        self._uninstrumented = self._pwm_out
+        self._pwm_out = _CountedOutput(self._pwm_out, stats)
+        self._set_duty_cycle = stats._timed(self._set_duty_cycle)
+        self._stats = stats
+        return stats
+
+    def disable_stats(self) -> None:
+        """Stops recording `stats` and removes the instrumentation."""
+        if self._stats is None:
+            return
+        self._pwm_out = self._uninstrumented
+        del self._set_duty_cycle
+        self._stats = None
+
 
 class Servo(_BaseServo):
     """Control the position of a servo.
@@ -132,6 +172,28 @@ class Servo(_BaseServo):
             raise ValueError("Angle out of range")
         self.fraction = new_angle / self.actuation_range
 
+    async def sweep_to(self, angle: float, duration: float) -> None:
+        """Moves the servo linearly to ``angle`` over ``duration`` seconds as an `asyncio`
+        coroutine, sleeping between changes so other tasks can run. Moves straight to ``angle``
+        if the servo is disabled.
+
+        :param float angle: Final angle in degrees
+        :param float duration: Length of the sweep in seconds"""
+        import asyncio
+
+        if angle is None or angle < 0 or angle > self.actuation_range:
+            raise ValueError("Angle out of range")
+        start = self.angle
+        if start is not None:
+            start_ns = time.monotonic_ns()
+            duration_ns = int(duration * 1000000000)
+            elapsed_ns = 0
+            while elapsed_ns < duration_ns:
+                self.angle = start + (angle - start) * elapsed_ns / duration_ns
+                await asyncio.sleep(_SWEEP_PERIOD)
+                elapsed_ns = time.monotonic_ns() - start_ns
+        self.angle = angle
+
 
 class ContinuousServo(_BaseServo):
     """Control a continuous rotation servo.
@@ -0,0 +1,150 @@
+# SPDX-FileCopyrightText: 2026 Adafruit Industries
+#
+# SPDX-License-Identifier: MIT
+
+"""
+`adafruit_motor.stats`
+====================================================
+
+Optional instrumentation of motor updates. Call ``enable_stats()`` on a
+`adafruit_motor.stepper.StepperMotor`, `adafruit_motor.motor.DCMotor` or servo to start
+recording into a `Stats` object. Recording works by wrapping the motor's update and output
+methods while it is enabled, so a motor without stats runs exactly the same code as before.
+"""
+
+import time
+from array import array
+
+try:
+    from typing import Any, Callable, Optional
+except ImportError:
+    pass
+
+__version__ = "0.0.0+auto.0"
+__repo__ = "https://github.com/adafruit/Adafruit_CircuitPython_Motor.git"
+
+
+class Stats:
+    """Call counts, hardware write counts and update latencies of one motor. Times are in
+    nanoseconds.
+
+    :param int jitter_bins: Number of bins in the `jitter` histogram, or ``0`` for none
+    :param int jitter_bin_width: Width of each `jitter` bin in nanoseconds"""
+
+    def __init__(self, *, jitter_bins: int = 0, jitter_bin_width: int = 100000) -> None:
+        if jitter_bins < 0 or jitter_bin_width <= 0:
+            raise ValueError("Jitter bins must not be negative and their width must be positive")
+        self.jitter = array("L", [0] * jitter_bins) if jitter_bins else None
+        """Number of steps by how late they were, in bins of ``jitter_bin_width``. The last bin
+        also counts every later step. ``None`` if not recorded.
+
+        :type: array
+        """
+        self.jitter_bin_width = jitter_bin_width
+        """Width of each `jitter` bin in nanoseconds.
+
+        :type: int
+        """
+        self.reset()
+
+    def reset(self) -> None:
+        """Clears all counts and timings."""
+        self.calls = 0
+        """Number of coil or duty cycle updates.
+
+        :type: int
+        """
+        self.writes = 0
+        """Number of writes to the hardware. A batch or port write counts once.
+
+        :type: int
+        """
+        self.min_latency = None
+        """Shortest update in nanoseconds, or ``None`` before the first update.
+
+        :type: int
+        """
+        self.max_latency = 0
+        """Longest update in nanoseconds.
+
+        :type: int
+        """
+        self.total_latency = 0
+        """Time spent in all updates in nanoseconds.
+
+        :type: int
+        """
+        if self.jitter is not None:
+            for i in range(len(self.jitter)):
+                self.jitter[i] = 0
+
+    @property
+    def mean_latency(self) -> Optional[float]:
+        """Average update in nanoseconds, or ``None`` before the first update."""
+        if self.calls == 0:
+            return None
+        return self.total_latency / self.calls
+
+    def _record_latency(self, latency: int) -> None:
+        self.calls += 1
+        self.total_latency += latency
+        if self.min_latency is None or latency < self.min_latency:
+            self.min_latency = latency
+        self.max_latency = max(self.max_latency, latency)
+
+    def _record_jitter(self, lateness: int) -> None:
+        jitter = self.jitter
+        if jitter is not None:
+            jitter[min(lateness // self.jitter_bin_width, len(jitter) - 1)] += 1
+
+    def _timed(self, function: Callable) -> Callable:
+        """Returns ``function`` wrapped to record its latency."""
+
+        def timed(*args, **kwargs) -> Any:
+            start = time.monotonic_ns()
+            result = function(*args, **kwargs)
+            self._record_latency(time.monotonic_ns() - start)
+            return result
+
+        return timed
+
+    def _counted(self, function: Callable) -> Callable:
+        """Returns the hardware write ``function`` wrapped to count its calls."""
+
+        def counted(*args) -> Any:
+            self.writes += 1
+            return function(*args)
+
+        return counted
+
+
+class _CountedOutput:
+    """Counts writes to a ``pwmio.PWMOut`` or ``digitalio.DigitalInOut`` and passes everything
+    else through."""
+
+    def __init__(self, output: Any, stats: Stats) -> None:
+        self._output = output
+        self._stats = stats
+
+    @property
+    def duty_cycle(self) -> int:
+        """Duty cycle of the output"""
+        return self._output.duty_cycle
+
+    @duty_cycle.setter
+    def duty_cycle(self, value: int) -> None:
+        self._output.duty_cycle = value
+        self._stats.writes += 1
+
+    @property
+    def value(self) -> bool:
+        """Value of the output"""
+        return self._output.value
+
+    @value.setter
+    def value(self, value: bool) -> None:
+        self._output.value = value
+        self._stats.writes += 1
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._output, name)
@@ -14,15 +14,18 @@ precise each step is.
 * Author(s): Tony DiCola, Scott Shawcroft
 """
 
-import math
+import time
+from array import array
 
 from micropython import const
 
 try:
-    from typing import Optional, Union
+    from typing import Callable, Iterator, Optional, Sequence, Tuple, Union
 
     from digitalio import DigitalInOut
 
+    from adafruit_motor.stats import Stats
+
     try:
         from pwmio import PWMOut
     except NotImplementedError:
@@ -53,12 +56,281 @@ MICROSTEP = const(4)
 """Step a fraction of a step by partially activating two neighboring coils. Step size is determined
    by ``microsteps`` constructor argument."""
 
+# Constants that specify the microstep current curve.
+SINE = const(1)
+"""Coil currents follow a sine and cosine so the holding torque is the same at every microstep."""
+LINEAR = const(2)
+"""Coil currents change linearly between full steps."""
+TORQUE_COMPENSATED = const(3)
+"""The stronger coil stays at full current so torque does not dip between full steps."""
+
+# Constants that specify the speed profile of a move.
+TRAPEZOIDAL = const(1)
+"""Accelerate and decelerate at a constant rate."""
+S_CURVE = const(2)
+"""Ease in and out of the acceleration for a smoother move."""
+
 _SINGLE_STEPS = bytes([0b0010, 0b0100, 0b0001, 0b1000])
 
 _DOUBLE_STEPS = bytes([0b1010, 0b0110, 0b0101, 0b1001])
 
 _INTERLEAVE_STEPS = bytes([0b1010, 0b0010, 0b0110, 0b0100, 0b0101, 0b0001, 0b1001, 0b1000])
 
+# The value of each of the four digital pins for every coil activation bitmask.
+_PIN_STATES = tuple(tuple(bool((bits >> i) & 0x01) for i in range(4)) for bits in range(16))
+
+# Current curves, coil duty cycle frames and step transitions shared by all motors with the same
+# number of microsteps and built-in curve. Only the most recently built few are kept.
+_MAX_TABLES = const(4)
+_TABLES = {}
+_TABLE_KEYS = []
+
+# The slowest MotionQueue move, so that its step interval in nanoseconds fits in 32 bits.
+_MIN_QUEUE_SPEED = 0.25
+
+
+def _build_curve(microsteps: int, curve: int) -> array:
+    """Returns the duty cycle of a coil for each microstep from off to full on."""
+    if curve == LINEAR:
+        return array("H", [0xFFFF * i // microsteps for i in range(microsteps + 1)])
+
+    import math
+
+    values = []
+    for i in range(microsteps + 1):
+        angle = math.pi / (2 * microsteps) * i
+        if curve == TORQUE_COMPENSATED:
+            value = min(1.0, math.tan(angle)) if 2 * i < microsteps else 1.0
+        else:
+            value = math.sin(angle)
+        values.append(int(round(0xFFFF * value)))
+    return array("H", values)
+
+
+def _check_curve(curve: Sequence[int], microsteps: int) -> array:
+    """Returns a user supplied curve as a compact table after checking it."""
+    if len(curve) != microsteps + 1:
+        raise ValueError("Curve must have microsteps + 1 values")
+    if curve[0] != 0:
+        raise ValueError("Curve must start at 0")
+    for i in range(microsteps):
+        if not curve[i] <= curve[i + 1] <= 0xFFFF:
+            raise ValueError("Curve must be increasing and at most 0xFFFF")
+    return array("H", curve)
+
+
+def _build_frames(curve: array, microsteps: int) -> Tuple[tuple, tuple]:
+    """Returns the four coil duty cycles for every microstep of one electrical cycle. The first
+    table is used for microstepping and the second for full torque SINGLE, DOUBLE and INTERLEAVE
+    steps."""
+    microstep_frames = []
+    full_frames = []
+    for current_microstep in range(4 * microsteps):
+        duty_cycles = [0, 0, 0, 0]
+        trailing_coil = (current_microstep // microsteps) % 4
+        leading_coil = (trailing_coil + 1) % 4
+        microstep = current_microstep % microsteps
+        duty_cycles[leading_coil] = curve[microstep]
+        duty_cycles[trailing_coil] = curve[microsteps - microstep]
+        microstep_frames.append(tuple(duty_cycles))
+
+        # This ensures DOUBLE steps use full torque. Without it, we'd use
+        #  partial torque from the microstepping curve (0xb504). Full torque is the curve's
+        #  last value, so a curve that limits the coil current also limits DOUBLE steps.
+        if (
+            duty_cycles[leading_coil] == duty_cycles[trailing_coil]
+            and duty_cycles[leading_coil] > 0
+        ):
+            duty_cycles[leading_coil] = curve[microsteps]
+            duty_cycles[trailing_coil] = curve[microsteps]
+        full_frames.append(tuple(duty_cycles))
+    return tuple(microstep_frames), tuple(full_frames)
+
+
+def _next_microstep(microstep: int, microsteps: int, direction: int, style: int) -> int:
+    # Adjust current steps based on the direction and type of step.
+    step_size = 0
+    if style == MICROSTEP:
+        step_size = 1
+    else:
+        half_step = microsteps // 2
+        full_step = microsteps
+        # Its possible the previous steps were MICROSTEPS so first align
+        #  with the interleave pattern.
+        additional_microsteps = microstep % half_step
+        if additional_microsteps != 0:
+            # We set microstep directly because our step size varies
+            # depending on the direction.
+            if direction == FORWARD:
+                microstep += half_step - additional_microsteps
+            else:
+                microstep -= additional_microsteps
+            step_size = 0
+        elif style == INTERLEAVE:
+            step_size = half_step
+
+        current_interleave = microstep // half_step
+        if (style == SINGLE and current_interleave % 2 == 1) or (
+            style == DOUBLE and current_interleave % 2 == 0
+        ):
+            step_size = half_step
+        elif style in {SINGLE, DOUBLE}:
+            step_size = full_step
+
+    if direction == FORWARD:
+        return microstep + step_size
+    return microstep - step_size
+
+
+def _build_transitions(microsteps: int) -> Tuple[int, ...]:
+    """Returns the change of the current microstep for every microstep within a full step, step
+    style and direction, indexed by ``(microstep * 4 + style - 1) * 2 + backward``."""
+    return tuple(
+        _next_microstep(microstep, microsteps, direction, style) - microstep
+        for microstep in range(microsteps)
+        for style in (SINGLE, DOUBLE, INTERLEAVE, MICROSTEP)
+        for direction in (FORWARD, BACKWARD)
+    )
+
+
+def _get_tables(microsteps: int, curve: Union[int, Sequence[int]]) -> tuple:
+    """Returns the curve, microstep frames, full torque frames and transitions for
+    ``microsteps`` and ``curve``. Tables for built-in curves are cached."""
+    if not isinstance(curve, int):
+        table = _check_curve(curve, microsteps)
+        microstep_frames, full_frames = _build_frames(table, microsteps)
+        return (table, microstep_frames, full_frames, _build_transitions(microsteps))
+    if curve not in {SINE, LINEAR, TORQUE_COMPENSATED}:
+        raise ValueError("Unsupported curve.")
+    key = (microsteps, curve)
+    tables = _TABLES.get(key)
+    if tables is None:
+        table = _build_curve(microsteps, curve)
+        microstep_frames, full_frames = _build_frames(table, microsteps)
+        tables = (table, microstep_frames, full_frames, _build_transitions(microsteps))
+        if len(_TABLE_KEYS) >= _MAX_TABLES:
+            del _TABLES[_TABLE_KEYS.pop(0)]
+        _TABLES[key] = tables
+        _TABLE_KEYS.append(key)
+    return tables
+
+
+def step_intervals(
+    steps: int, max_speed: float, acceleration: float, *, profile: int = TRAPEZOIDAL
+) -> Iterator[int]:
+    """Generates the time to wait before each of ``steps`` steps, in nanoseconds, to speed up from
+    a stop to ``max_speed`` and slow down to a stop again at the end of the move. Short moves
+    start slowing down before reaching ``max_speed``.
+
+    Only the first interval needs a square root. `TRAPEZOIDAL` intervals follow David Austin's
+    integer approximation of constant acceleration. `S_CURVE` intervals use the same update with
+    an acceleration that eases in and out along a smoothstep, so each later interval costs a few
+    integer operations. Ramps of only a few steps change speed too much per step for that, and
+    take a square root per step instead.
+
+    .. code-block:: python
+
+        for interval in stepper.step_intervals(1000, 800, 2000):
+            time.sleep(interval / 1e9)
+            motor.onestep()
+
+    :param int steps: Number of steps in the move
+    :param float max_speed: Top speed in steps per second
+    :param float acceleration: Acceleration in steps per second squared. `S_CURVE` moves reach
+      it at their steepest point.
+    :param int profile: `TRAPEZOIDAL` or `S_CURVE`"""
+    if max_speed <= 0 or acceleration <= 0:
+        raise ValueError("Speed and acceleration must be positive")
+    if profile not in {TRAPEZOIDAL, S_CURVE}:
+        raise ValueError("Unsupported motion profile.")
+    min_interval = int(1000000000 / max_speed)
+    # 0.676 corrects the error of the approximation's first step.
+    first_interval = max(int(676000000 * (2 / acceleration) ** 0.5), min_interval)
+    # Steps needed to reach full speed and the steps actually spent speeding up.
+    if profile == TRAPEZOIDAL:
+        full_ramp = max(1, int(max_speed * max_speed / (2 * acceleration)))
+    else:
+        full_ramp = max(1, int(3 * max_speed * max_speed / (4 * acceleration)))
+    ramp = min(full_ramp, steps // 2)
+    start_speed = 1000000000 / first_interval
+    if profile == S_CURVE and ramp < full_ramp:
+        # A short move eases in and out over its own ramp to the top speed that the acceleration
+        #  allows, rather than stopping partway up the curve of the full ramp.
+        full_ramp = max(1, ramp)
+        top_speed = (
+            start_speed * start_speed
+            + 4
+            * acceleration
+            * (full_ramp * full_ramp * full_ramp - full_ramp)
+            / (3 * full_ramp * full_ramp)
+        ) ** 0.5
+        max_speed = min(max_speed, top_speed)
+        min_interval = min(first_interval, int(1000000000 / max_speed))
+    # The S-curve accelerates at speed_change * n * (full_ramp - n) / cube in its n-th step. Over
+    #  the ramp this adds up to half the change of the square of the speed.
+    speed_change = 3 * int(max_speed * max_speed - start_speed * start_speed)
+    cube = max(1, full_ramp * full_ramp * full_ramp - full_ramp)
+
+    interval = first_interval
+    for step in range(steps):
+        remaining = steps - step
+        if step == 0:
+            interval = first_interval
+        elif remaining <= ramp:
+            # Slowing down mirrors speeding up. An even move has its top speed twice.
+            if remaining != step:
+                if profile == TRAPEZOIDAL:
+                    interval += 2 * interval // (4 * remaining - 1)
+                else:
+                    change = speed_change * remaining * (full_ramp - remaining) // cube
+                    interval = _eased_interval(interval, -change, first_interval)
+        elif interval > min_interval:
+            if profile == TRAPEZOIDAL:
+                interval -= 2 * interval // (4 * step + 1)
+            elif step >= full_ramp:
+                interval = min_interval
+            else:
+                change = speed_change * step * (full_ramp - step) // cube
+                interval = _eased_interval(interval, change, first_interval)
+            interval = max(interval, min_interval)
+        yield interval
+
+
+def _eased_interval(interval: int, acceleration: int, longest: int) -> int:
+    """Returns the interval of the next step when accelerating at ``acceleration`` steps per
+    second squared for one step, at most ``longest``."""
+    # One step changes the square of the speed by twice the acceleration, so the interval is
+    #  divided by the square root of 1 + ratio.
+    change = acceleration * interval * interval * interval // 1000000000000000000
+    if 16 * abs(change) <= interval:
+        # The first terms of the series of the square root are close enough for small changes.
+        return min(longest, interval - change + 3 * change * change // (2 * interval))
+    # Short ramps change speed a lot every step.
+    ratio = 2 * change / interval
+    if ratio <= -1:
+        return longest
+    return min(longest, int(interval / (1 + ratio) ** 0.5))
+
+
+def _constant_intervals(steps: int, interval: int) -> Iterator[int]:
+    for _ in range(steps):
+        yield interval
+
+
+def _repeat(interval: int) -> Iterator[int]:
+    while True:
+        yield interval
+
+
+def _move_intervals(
+    steps: int, speed: float, acceleration: Optional[float], profile: int
+) -> Iterator[int]:
+    if acceleration is None:
+        if speed <= 0:
+            raise ValueError("Speed must be positive")
+        return _constant_intervals(steps, int(1000000000 / speed))
+    return step_intervals(steps, speed, acceleration, profile=profile)
+
 
 class StepperMotor:
     """A bipolar stepper motor or four coil unipolar motor. The use of microstepping requires
@@ -76,6 +348,15 @@ class StepperMotor:
     :param ~pwmio.PWMOut bin2: `pwmio.PWMOut`-compatible output connected to the driver for
       the fourth coil (unipolar) or second input to second coil (bipolar).
     :param int microsteps: Number of microsteps between full steps. Must be at least 2 and even.
+    :param curve: Shape of the coil current between full steps. Either `SINE`, `LINEAR`,
+      `TORQUE_COMPENSATED` or a sequence of ``microsteps + 1`` increasing duty cycles that
+      starts at 0, such as ``array('H', ...)``. Entry ``i`` is the duty cycle of the coil being
+      turned on ``i`` microsteps after a full step.
+
+    If all four outputs have a ``set_duty_cycles(outputs, duty_cycles)`` method, it is called on
+    the first output with the tuple of outputs and their new duty cycles instead of setting each
+    ``duty_cycle`` separately. This lets a driver, such as one for a PCA9685, commit all of the
+    coils in one bus transaction.
 
     **Digital Out**
 
@@ -88,6 +369,14 @@ class StepperMotor:
     :param ~digitalio.DigitalInOut bin2: `digitalio.DigitalInOut`-compatible output connected to
       the driver for the fourth coil (unipolar) or second input to second coil (bipolar).
     :param microsteps: set to `None`
+    :param port_writer: Optional function that sets all four pins at once, for boards or GPIO
+      expanders that can write a port in one operation. It is called with a bitmask that has
+      bit 0 set for ``ain1`` through bit 3 for ``bin2``, and the pins are not written directly.
+
+    **Both**
+
+    :param int steps_per_rev: Number of full steps per revolution of the motor. Only needed to
+      use `rpm`.
     """
 
     def __init__(
@@ -98,6 +387,9 @@ class StepperMotor:
         bin2: Union[PWMOut, DigitalInOut],
         *,
         microsteps: Optional[int] = 16,
+        curve: Union[int, Sequence[int]] = SINE,
+        port_writer: Optional[Callable[[int], None]] = None,
+        steps_per_rev: Optional[int] = None,
     ) -> None:
         if microsteps is None:
             #
@@ -105,6 +397,8 @@ class StepperMotor:
             #
             self._steps = None
             self._coil = (ain1, ain2, bin1, bin2)
+            self._port_writer = port_writer
+            self._batch_write = None
         else:
             #
             # PWM Pins
@@ -124,12 +418,45 @@ class StepperMotor:
                 raise ValueError("Microsteps must be at least 2")
             if microsteps % 2 == 1:
                 raise ValueError("Microsteps must be even")
-            self._curve = [
-                int(round(0xFFFF * math.sin(math.pi / (2 * microsteps) * i)))
-                for i in range(microsteps + 1)
-            ]
+            tables = _get_tables(microsteps, curve)
+            self._curve, self._microstep_frames, self._full_frames, self._transitions = tables
+            # Commit all four duty cycles at once when the outputs support it.
+            if all(hasattr(coil, "set_duty_cycles") for coil in self._coil):
+                self._batch_write = self._coil[0].set_duty_cycles
+            else:
+                self._batch_write = None
+            self._port_writer = None
         self._current_microstep = 0
         self._microsteps = microsteps
+        self._steps_per_rev = steps_per_rev
+        # The microstep that is reported as position 0.
+        self._origin = 0
+        # The last value written to each coil output, used to skip writes that change nothing.
+        self._written = [None, None, None, None]
+        self._written_bits = None
+        # Whether the last frames from iter_frames() were microsteps.
+        self._frames_microstepping = False
+        # The move being played back by update().
+        self._intervals = None
+        self._next_step_ns = 0
+        self._move_direction = FORWARD
+        self._move_style = SINGLE
+        self._target_microstep = 0
+        self._remaining = 0
+        self._interval = 0
+        # Signed steps per second while spinning continuously, otherwise 0.
+        self._velocity = 0
+        # Step intervals below which scheduled MICROSTEP moves take coarser steps.
+        self._interleave_interval = None
+        self._double_interval = None
+        self._adaptive = False
+        # Fraction of full current, out of 0x10000, that idle coils are reduced to.
+        self._hold_level = None
+        self._hold_delay_ns = 500000000
+        # When update() first saw the motor idle, or None if it has stepped since.
+        self._idle_since = None
+        self._holding = False
+        self._stats = None
         self._update_coils()
 
     def _update_coils(self, *, microstepping: bool = False) -> None:
@@ -143,56 +470,134 @@ class StepperMotor:
             else:
                 steps = self._steps[self._current_microstep % len(self._steps)]
             # Energize coils as appropriate:
-            for i, coil in enumerate(self._coil):
-                coil.value = (steps >> i) & 0x01
+            self._write_pins(steps)
         else:
             #
             # PWM Pins
             #
-            duty_cycles = [0, 0, 0, 0]
-            trailing_coil = (self._current_microstep // self._microsteps) % 4
-            leading_coil = (trailing_coil + 1) % 4
-            microstep = self._current_microstep % self._microsteps
-            duty_cycles[leading_coil] = self._curve[microstep]
-            duty_cycles[trailing_coil] = self._curve[self._microsteps - microstep]
-
-            # This ensures DOUBLE steps use full torque. Without it, we'd use
-            #  partial torque from the microstepping curve (0xb504).
-            if not microstepping and (
-                duty_cycles[leading_coil] == duty_cycles[trailing_coil]
-                and duty_cycles[leading_coil] > 0
-            ):
-                duty_cycles[leading_coil] = 0xFFFF
-                duty_cycles[trailing_coil] = 0xFFFF
-
+            frames = self._microstep_frames if microstepping else self._full_frames
             # Energize coils as appropriate:
+            self._write_duty_cycles(frames[self._current_microstep % len(frames)])
+            self._idle_since = None
+
+    def _write_duty_cycles(self, duty_cycles: Tuple[int, ...], *, force: bool = False) -> None:
+        written = self._written
+        if self._batch_write is None:
+            for i in range(4):
+                if force or written[i] != duty_cycles[i]:
+                    self._coil[i].duty_cycle = duty_cycles[i]
+                    written[i] = duty_cycles[i]
+        else:
+            changed = force
             for i in range(4):
-                self._coil[i].duty_cycle = duty_cycles[i]
+                if written[i] != duty_cycles[i]:
+                    written[i] = duty_cycles[i]
+                    changed = True
+            if changed:
+                self._batch_write(self._coil, duty_cycles)
+
+    def _write_pins(self, bits: int, *, force: bool = False) -> None:
+        if bits == self._written_bits and not force:
+            return
+        self._written_bits = bits
+        if self._port_writer is not None:
+            self._port_writer(bits)
+            return
+        pins = _PIN_STATES[bits]
+        written = self._written
+        for i in range(4):
+            if force or written[i] != pins[i]:
+                self._coil[i].value = pins[i]
+                written[i] = pins[i]
 
     def release(self) -> None:
         """Releases all the coils so the motor can free spin, also won't use any power"""
         # De-energize coils:
-        for coil in self._coil:
-            if self._microsteps is None:
-                coil.value = 0
+        if self._microsteps is None:
+            self._write_pins(0b0000)
+        else:
+            self._write_duty_cycles((0, 0, 0, 0))
+
+    def resync(self) -> None:
+        """Writes the current state of every coil output again. Unchanged outputs are normally
+        skipped, so call this if the outputs were reset or changed outside of this object."""
+        if self._microsteps is None:
+            if self._written_bits is None:
+                # Nothing has been written since iter_frames(), so write the current step.
+                self._update_coils()
             else:
-                coil.duty_cycle = 0
+                self._write_pins(self._written_bits, force=True)
+        elif None in self._written:
+            self._update_coils(microstepping=self._frames_microstepping)
+        else:
+            self._write_duty_cycles(tuple(self._written), force=True)
 
-    def onestep(self, *, direction: int = FORWARD, style: int = SINGLE) -> None:
-        """Performs one step of a particular style. The actual rotation amount will vary by style.
-        `SINGLE` and `DOUBLE` will normal cause a full step rotation. `INTERLEAVE` will normally
-        do a half step rotation. `MICROSTEP` will perform the smallest configured step.
+    @property
+    def stats(self) -> Optional["Stats"]:
+        """The `adafruit_motor.stats.Stats` being recorded, or ``None`` if `enable_stats` has
+        not been called."""
+        return self._stats
 
-        When step styles are mixed, subsequent `SINGLE`, `DOUBLE` or `INTERLEAVE` steps may be
-        less than normal in order to align to the desired style's pattern.
+    def enable_stats(self, *, jitter_bins: int = 16, jitter_bin_width: int = 100000) -> "Stats":
+        """Starts recording coil updates, hardware writes and how late each step played back by
+        `update` is into a new `adafruit_motor.stats.Stats`. Until this is called no time is
+        spent recording anything.
 
-        :param int direction: Either `FORWARD` or `BACKWARD`
-        :param int style: `SINGLE`, `DOUBLE`, `INTERLEAVE`"""
+        :param int jitter_bins: Number of bins in the lateness histogram
+        :param int jitter_bin_width: Width of each bin in nanoseconds
+        :return: The new `stats`"""
+        from adafruit_motor.stats import Stats, _CountedOutput
+
+        self.disable_stats()
+        stats = Stats(jitter_bins=jitter_bins, jitter_bin_width=jitter_bin_width)
+        self._uninstrumented = (self._coil, self._batch_write, self._port_writer)
+        if self._batch_write is not None:
+            self._batch_write = stats._counted(self._batch_write)
+        elif self._port_writer is not None:
+            self._port_writer = stats._counted(self._port_writer)
+        else:
+            self._coil = tuple(_CountedOutput(coil, stats) for coil in self._coil)
+        self._update_coils = stats._timed(self._update_coils)
+        update = self.update
+
+        def recorded_update(now: Optional[int] = None) -> bool:
+            if now is None:
+                now = time.monotonic_ns()
+            due = self._next_step_ns
+            stepping = self._intervals is not None and now >= due
+            moving = update(now)
+            if stepping:
+                stats._record_jitter(now - due)
+            return moving
+
+        self.update = recorded_update
+        self._stats = stats
+        return stats
+
+    def disable_stats(self) -> None:
+        """Stops recording `stats` and removes the instrumentation."""
+        if self._stats is None:
+            return
+        self._coil, self._batch_write, self._port_writer = self._uninstrumented
+        del self._update_coils
+        del self.update
+        self._stats = None
+
+    def _next_microstep(self, microstep: int, direction: int, style: int) -> int:
+        if not SINGLE <= style <= MICROSTEP:
+            raise ValueError("Unsupported step style.")
+        return (
+            microstep
+            + self._transitions[
+                ((microstep % self._microsteps) * 4 + style - 1) * 2 + (direction != FORWARD)
+            ]
+        )
+
+    def _advance(self, direction: int, style: int) -> None:
         if self._microsteps is None:
             #
             # Digital IO Pins
             #
-            step_size = 1
             if style == SINGLE:
                 self._steps = _SINGLE_STEPS
             elif style == DOUBLE:
@@ -201,45 +606,839 @@ class StepperMotor:
                 self._steps = _INTERLEAVE_STEPS
             else:
                 raise ValueError("Unsupported step style.")
+            if direction == FORWARD:
+                self._current_microstep += 1
+            else:
+                self._current_microstep -= 1
         else:
             #
             # PWM Pins
             #
-            # Adjust current steps based on the direction and type of step.
-            step_size = 0
-            if style == MICROSTEP:
-                step_size = 1
-            else:
-                half_step = self._microsteps // 2
-                full_step = self._microsteps
-                # Its possible the previous steps were MICROSTEPS so first align
-                #  with the interleave pattern.
-                additional_microsteps = self._current_microstep % half_step
-                if additional_microsteps != 0:
-                    # We set _current_microstep directly because our step size varies
-                    # depending on the direction.
-                    if direction == FORWARD:
-                        self._current_microstep += half_step - additional_microsteps
-                    else:
-                        self._current_microstep -= additional_microsteps
-                    step_size = 0
-                elif style == INTERLEAVE:
-                    step_size = half_step
-
-                current_interleave = self._current_microstep // half_step
-                if (style == SINGLE and current_interleave % 2 == 1) or (
-                    style == DOUBLE and current_interleave % 2 == 0
-                ):
-                    step_size = half_step
-                elif style in {SINGLE, DOUBLE}:
-                    step_size = full_step
-
-        if direction == FORWARD:
-            self._current_microstep += step_size
-        else:
-            self._current_microstep -= step_size
+            self._current_microstep = self._next_microstep(
+                self._current_microstep, direction, style
+            )
+
+    def onestep(self, *, direction: int = FORWARD, style: int = SINGLE) -> None:
+        """Performs one step of a particular style. The actual rotation amount will vary by style.
+        `SINGLE` and `DOUBLE` will normal cause a full step rotation. `INTERLEAVE` will normally
+        do a half step rotation. `MICROSTEP` will perform the smallest configured step.
+
+        When step styles are mixed, subsequent `SINGLE`, `DOUBLE` or `INTERLEAVE` steps may be
+        less than normal in order to align to the desired style's pattern.
+
+        :param int direction: Either `FORWARD` or `BACKWARD`
+        :param int style: `SINGLE`, `DOUBLE`, `INTERLEAVE`"""
+        self._advance(direction, style)
 
         # Now that we know our target microstep we can determine how to energize the four coils.
         self._update_coils(microstepping=style == MICROSTEP)
 
         return self._current_microstep
+
+    def _step_size(self, style: int) -> int:
+        # Size of a step that is already aligned to the style's pattern.
+        if self._microsteps is None or style == MICROSTEP:
+            return 1
+        if style == INTERLEAVE:
+            return self._microsteps // 2
+        return self._microsteps
+
+    def _end_microstep(self, count: int, direction: int, style: int) -> int:
+        # The microstep that count steps from the current one end on.
+        if count == 0:
+            return self._current_microstep
+        step_size = self._step_size(style)
+        if direction != FORWARD:
+            step_size = -step_size
+        if self._microsteps is None:
+            return self._current_microstep + count * step_size
+        first = self._next_microstep(self._current_microstep, direction, style)
+        return first + (count - 1) * step_size
+
+    def step(self, count: int, *, direction: int = FORWARD, style: int = SINGLE) -> int:
+        """Performs ``count`` steps of a particular style. The coils end up in the same state as
+        calling `onestep` ``count`` times, but the step size is only worked out once and the
+        remaining steps are played back in a tight loop.
+
+        :param int count: Number of steps to perform. Must not be negative.
+        :param int direction: Either `FORWARD` or `BACKWARD`
+        :param int style: `SINGLE`, `DOUBLE`, `INTERLEAVE` or `MICROSTEP`
+        :return: The current microstep"""
+        if count < 0:
+            raise ValueError("Step count must not be negative")
+        if style not in {SINGLE, DOUBLE, INTERLEAVE} and (
+            self._microsteps is None or style != MICROSTEP
+        ):
+            raise ValueError("Unsupported step style.")
+        if count == 0:
+            return self._current_microstep
+
+        # The first step may be shorter in order to align to the style's pattern. Every step
+        # after it is the same size.
+        self.onestep(direction=direction, style=style)
+        step_size = self._step_size(style)
+        if direction != FORWARD:
+            step_size = -step_size
+
+        microstepping = style == MICROSTEP
+        update_coils = self._update_coils
+        for _ in range(count - 1):
+            self._current_microstep += step_size
+            update_coils(microstepping=microstepping)
+
+        return self._current_microstep
+
+    def iter_frames(self, count: int, *, direction: int = FORWARD, style: int = SINGLE) -> Iterator:
+        """Generates the coil outputs of ``count`` steps without writing them, so they can be
+        streamed out by other means such as a DMA buffer or a bulk PCA9685 write. The motor's
+        `position` advances as frames are generated, and the next write to the coils rewrites
+        all of them.
+
+        Each PWM frame is a tuple of the four duty cycles in the order of the ``ain1``, ``ain2``,
+        ``bin1`` and ``bin2`` arguments. Each digital frame is an int with bit 0 for ``ain1``
+        through bit 3 for ``bin2``.
+
+        :param int count: Number of steps to generate. Must not be negative.
+        :param int direction: Either `FORWARD` or `BACKWARD`
+        :param int style: `SINGLE`, `DOUBLE`, `INTERLEAVE` or `MICROSTEP`"""
+        if count < 0:
+            raise ValueError("Step count must not be negative")
+        # The outputs no longer match what this object last wrote to them.
+        self._written = [None, None, None, None]
+        self._written_bits = None
+        self._frames_microstepping = style == MICROSTEP
+        self._idle_since = None
+        if self._microsteps is None:
+            for _ in range(count):
+                self._advance(direction, style)
+                yield self._steps[self._current_microstep % len(self._steps)]
+        else:
+            frames = self._microstep_frames if style == MICROSTEP else self._full_frames
+            for _ in range(count):
+                self._advance(direction, style)
+                frame = frames[self._current_microstep % len(frames)]
+                yield (frame[2], frame[0], frame[1], frame[3])
+
+    def pack_frames(
+        self, buffer: array, count: int, *, direction: int = FORWARD, style: int = SINGLE
+    ) -> int:
+        """Fills a preallocated buffer, such as an ``array('H')``, with the frames of up to
+        ``count`` steps from `iter_frames`. PWM frames take four entries each and digital frames
+        take one.
+
+        :param buffer: The buffer to fill from its start
+        :param int count: Number of steps to generate. Must not be negative.
+        :param int direction: Either `FORWARD` or `BACKWARD`
+        :param int style: `SINGLE`, `DOUBLE`, `INTERLEAVE` or `MICROSTEP`
+        :return: The number of frames packed"""
+        if self._microsteps is None:
+            count = min(count, len(buffer))
+            for i, frame in enumerate(self.iter_frames(count, direction=direction, style=style)):
+                buffer[i] = frame
+        else:
+            count = min(count, len(buffer) // 4)
+            i = 0
+            for frame in self.iter_frames(count, direction=direction, style=style):
+                buffer[i] = frame[0]
+                buffer[i + 1] = frame[1]
+                buffer[i + 2] = frame[2]
+                buffer[i + 3] = frame[3]
+                i += 4
+        return count
+
+    def schedule(
+        self,
+        steps: int,
+        *,
+        direction: int = FORWARD,
+        style: int = SINGLE,
+        speed: float,
+        acceleration: Optional[float] = None,
+        profile: int = TRAPEZOIDAL,
+    ) -> None:
+        """Starts a move of ``steps`` steps that is played back by calling `update` from the main
+        loop. Any move in progress is replaced.
+
+        :param int steps: Number of steps to perform. Must not be negative.
+        :param int direction: Either `FORWARD` or `BACKWARD`
+        :param int style: `SINGLE`, `DOUBLE`, `INTERLEAVE` or `MICROSTEP`
+        :param float speed: Speed in steps per second. The top speed when ``acceleration`` is set.
+        :param float acceleration: Acceleration in steps per second squared, or ``None`` to move
+          at a constant ``speed``.
+        :param int profile: `TRAPEZOIDAL` or `S_CURVE`. See `step_intervals`."""
+        if steps < 0:
+            raise ValueError("Step count must not be negative")
+        intervals = _move_intervals(steps, speed, acceleration, profile)
+        self._move_direction = direction
+        self._move_style = style
+        self._target_microstep = self._end_microstep(steps, direction, style)
+        self._remaining = steps
+        self._velocity = 0
+        self._adaptive = style == MICROSTEP and (
+            self._interleave_interval is not None or self._double_interval is not None
+        )
+        first_interval = next(intervals, None)
+        if first_interval is None:
+            self._intervals = None
+            return
+        self._intervals = intervals
+        self._interval = first_interval
+        self._next_step_ns = time.monotonic_ns() + first_interval
+
+    def update(self, now: Optional[int] = None) -> bool:
+        """Performs the next step of the scheduled move if it is due. Call this as often as
+        possible from the main loop. Steps are timed from their deadlines rather than from when
+        `update` runs, so occasional late calls do not slow the move down.
+
+        While no move is in progress, `update` reduces the coil current after `hold_delay` if
+        `hold_current` is set.
+
+        :param int now: The current `time.monotonic_ns`, to share one reading between motors
+        :return: ``True`` while the move is in progress"""
+        if self._intervals is None:
+            if self._hold_level is not None:
+                self._hold(now)
+            return False
+        if now is None:
+            now = time.monotonic_ns()
+        if now < self._next_step_ns:
+            return True
+        if self._adaptive:
+            # Coarse steps use the microstep frames so the coil current does not jump when the
+            #  style changes.
+            style, step_size = self._adaptive_style()
+            self._advance(self._move_direction, style)
+            self._update_coils(microstepping=True)
+        else:
+            step_size = 1
+            self.onestep(direction=self._move_direction, style=self._move_style)
+        if self._remaining is not None:
+            self._remaining -= step_size
+        # A coarser step covers the time of each microstep it replaces.
+        for _ in range(step_size):
+            interval = next(self._intervals, None)
+            if interval is None:
+                self._intervals = None
+                return False
+            self._next_step_ns += interval
+        self._interval = interval
+        return True
+
+    def _hold(self, now: Optional[int]) -> None:
+        if now is None:
+            now = time.monotonic_ns()
+        if self._idle_since is None:
+            self._idle_since = now
+            self._holding = False
+        elif not self._holding and now - self._idle_since >= self._hold_delay_ns:
+            # Scale the frame of the last step. The next step writes a full current frame again.
+            frame = self._written
+            if None in frame:
+                # Nothing has been written since iter_frames(), so scale its last frame.
+                frames = self._microstep_frames if self._frames_microstepping else self._full_frames
+                frame = frames[self._current_microstep % len(frames)]
+            level = self._hold_level
+            self._write_duty_cycles(tuple(duty * level >> 16 for duty in frame))
+            self._holding = True
+
+    @property
+    def hold_current(self) -> Optional[float]:
+        """Fraction of full current that the coils are reduced to once the motor has been idle
+        for `hold_delay`, or ``None`` to always hold at full current. Lower current saves power
+        and heat but holds the position with less torque. Full current is restored by the next
+        step. Needs `update` to be called while idle, and microsteps."""
+        if self._hold_level is None:
+            return None
+        return self._hold_level / 0x10000
+
+    @hold_current.setter
+    def hold_current(self, fraction: Optional[float]) -> None:
+        if fraction is None:
+            self._hold_level = None
+            return
+        if self._microsteps is None:
+            raise ValueError("Hold current requires microsteps")
+        if not 0.0 <= fraction <= 1.0:
+            raise ValueError("Hold current must be 0.0 to 1.0")
+        self._hold_level = int(fraction * 0x10000)
+        self._idle_since = None
+
+    @property
+    def hold_delay(self) -> float:
+        """Seconds that the motor must be idle before `hold_current` applies. Defaults to
+        ``0.5``."""
+        return self._hold_delay_ns / 1000000000
+
+    @hold_delay.setter
+    def hold_delay(self, seconds: float) -> None:
+        if seconds < 0:
+            raise ValueError("Hold delay must not be negative")
+        self._hold_delay_ns = int(seconds * 1000000000)
+
+    def _adaptive_style(self) -> Tuple[int, int]:
+        # Only switch to coarser steps where they line up with the current microstep, so the
+        # move stays on the same phase and ends exactly on target.
+        half_step = self._microsteps // 2
+        phase = self._current_microstep % self._microsteps
+        remaining = self._remaining
+        if remaining is None:  # Spinning continuously
+            remaining = self._microsteps
+        interval = self._interval
+        fast = self._double_interval is not None and interval <= self._double_interval
+        if fast and phase == half_step and remaining >= self._microsteps:
+            return DOUBLE, self._microsteps
+        if self._interleave_interval is not None and interval <= self._interleave_interval:
+            fast = True
+        if fast and phase % half_step == 0 and remaining >= half_step:
+            return INTERLEAVE, half_step
+        return MICROSTEP, 1
+
+    def _speed_interval(self, speed: Optional[float]) -> Optional[int]:
+        if speed is None:
+            return None
+        if self._microsteps is None:
+            raise ValueError("Adaptive stepping requires microsteps")
+        if speed <= 0:
+            raise ValueError("Speed must be positive")
+        return int(1000000000 / speed)
+
+    @property
+    def interleave_speed(self) -> Optional[float]:
+        """Speed in microsteps per second at and above which scheduled `MICROSTEP` moves take
+        `INTERLEAVE` half steps instead, or ``None`` to keep microstepping. Fewer coil updates
+        allow higher top speeds. Steps only switch where they line up with the current
+        microstep, so the move ends exactly where it would have otherwise."""
+        if self._interleave_interval is None:
+            return None
+        return 1000000000 / self._interleave_interval
+
+    @interleave_speed.setter
+    def interleave_speed(self, speed: Optional[float]) -> None:
+        self._interleave_interval = self._speed_interval(speed)
+
+    @property
+    def double_speed(self) -> Optional[float]:
+        """Speed in microsteps per second at and above which scheduled `MICROSTEP` moves take
+        `DOUBLE` full steps instead, or ``None`` to not use full steps. See `interleave_speed`."""
+        if self._double_interval is None:
+            return None
+        return 1000000000 / self._double_interval
+
+    @double_speed.setter
+    def double_speed(self, speed: Optional[float]) -> None:
+        self._double_interval = self._speed_interval(speed)
+
+    @property
+    def is_moving(self) -> bool:
+        """``True`` while a scheduled move has steps left."""
+        return self._intervals is not None
+
+    def stop(self) -> None:
+        """Abandons the scheduled move or spin. The coils stay energized to hold position."""
+        self._intervals = None
+        self._velocity = 0
+
+    def spin(self, velocity: float, *, style: int = SINGLE) -> None:
+        """Turns the motor continuously at ``velocity`` steps of ``style`` per second when
+        `update` is called from the main loop, until `stop` is called or a move is scheduled.
+        Steps keep to their deadlines, so late calls to `update` are caught up and the long-run
+        speed is exact. Calling it while spinning changes speed without a pause.
+
+        :param float velocity: Steps per second, negative to turn `BACKWARD`. ``0`` stops.
+        :param int style: `SINGLE`, `DOUBLE`, `INTERLEAVE` or `MICROSTEP`"""
+        if velocity == 0:
+            self.stop()
+            return
+        interval = int(1000000000 / abs(velocity))
+        if self._velocity:
+            # Keep the time of the last step.
+            self._next_step_ns += interval - self._interval
+        else:
+            self._next_step_ns = time.monotonic_ns() + interval
+        self._velocity = velocity
+        self._move_direction = FORWARD if velocity > 0 else BACKWARD
+        self._move_style = style
+        self._remaining = None
+        self._adaptive = style == MICROSTEP and (
+            self._interleave_interval is not None or self._double_interval is not None
+        )
+        self._interval = interval
+        self._intervals = _repeat(interval)
+
+    @property
+    def velocity(self) -> float:
+        """Speed of the current `spin` in steps per second, negative when turning `BACKWARD`.
+        ``0`` when not spinning. Setting it spins with the style of the last move."""
+        return self._velocity
+
+    @velocity.setter
+    def velocity(self, velocity: float) -> None:
+        self.spin(velocity, style=self._move_style)
+
+    def _steps_per_full_step(self, style: int) -> int:
+        if self._microsteps is None:
+            return 2 if style == INTERLEAVE else 1
+        return self._microsteps // self._step_size(style)
+
+    @property
+    def rpm(self) -> float:
+        """Speed of the current `spin` in revolutions per minute, negative when turning
+        `BACKWARD`. Needs ``steps_per_rev``. Setting it spins with the style of the last move."""
+        if self._steps_per_rev is None:
+            raise ValueError("steps_per_rev must be set to use rpm")
+        full_steps = self._velocity / self._steps_per_full_step(self._move_style)
+        return full_steps * 60 / self._steps_per_rev
+
+    @rpm.setter
+    def rpm(self, rpm: float) -> None:
+        if self._steps_per_rev is None:
+            raise ValueError("steps_per_rev must be set to use rpm")
+        steps = rpm * self._steps_per_rev / 60 * self._steps_per_full_step(self._move_style)
+        self.spin(steps, style=self._move_style)
+
+    @property
+    def position(self) -> int:
+        """The position of the motor in microsteps, or in steps of any style when using digital
+        pins. Setting it changes the reported position without moving the motor, for example
+        after homing."""
+        return self._current_microstep - self._origin
+
+    @position.setter
+    def position(self, value: int) -> None:
+        self._origin = self._current_microstep - value
+
+    @property
+    def full_steps(self) -> float:
+        """The position of the motor in full steps. Fractional between full steps. When using
+        digital pins, `INTERLEAVE` steps count as half steps. Digital pin positions are only
+        consistent while one style of step is used, because each style has its own sequence."""
+        if self._microsteps is None:
+            if self._steps is _INTERLEAVE_STEPS:
+                return self.position / 2
+            return self.position
+        return self.position / self._microsteps
+
+    @property
+    def target(self) -> int:
+        """The `position` that the scheduled move ends at, or the current `position` when no
+        move is scheduled."""
+        if self._intervals is None or self._velocity:
+            return self.position
+        return self._target_microstep - self._origin
+
+    @property
+    def distance_to_go(self) -> int:
+        """The number of microsteps from the current `position` to the `target`."""
+        return self.target - self.position
+
+    def move_by(self, delta: int, *, style: int = MICROSTEP) -> int:
+        """Moves the motor by ``delta`` microsteps right away. As much of the move as possible
+        uses steps of ``style`` and the rest is made up with `MICROSTEP` steps. When using
+        digital pins ``delta`` is a number of ``style`` steps.
+
+        :param int delta: Distance to move, negative to move `BACKWARD`
+        :param int style: `SINGLE`, `DOUBLE`, `INTERLEAVE` or `MICROSTEP`
+        :return: The new `position`"""
+        direction = FORWARD if delta >= 0 else BACKWARD
+        if self._microsteps is None or style == MICROSTEP:
+            self.step(abs(delta), direction=direction, style=style)
+            return self.position
+        target = self._current_microstep + delta
+        first = self._next_microstep(self._current_microstep, direction, style)
+        if (target - first) * delta >= 0 and delta != 0:
+            count = 1 + abs(target - first) // self._step_size(style)
+            self.step(count, direction=direction, style=style)
+        self.step(abs(target - self._current_microstep), direction=direction, style=MICROSTEP)
+        return self.position
+
+    def move_to(self, position: int, *, style: int = MICROSTEP) -> int:
+        """Moves the motor to ``position`` right away. See `move_by`.
+
+        :param int position: The `position` to move to
+        :param int style: `SINGLE`, `DOUBLE`, `INTERLEAVE` or `MICROSTEP`
+        :return: The new `position`"""
+        return self.move_by(position - self.position, style=style)
+
+    def _step_until(
+        self,
+        switch: Optional[DigitalInOut],
+        value: bool,
+        count: Optional[int],
+        direction: int,
+        style: int,
+        speed: float,
+    ) -> int:
+        # Steps at speed until switch.value is value, polling it between steps. Stops after
+        # count steps, which is an error if there is a switch to wait for.
+        if speed <= 0:
+            raise ValueError("Speed must be positive")
+        interval = int(1000000000 / speed)
+        deadline = time.monotonic_ns()
+        steps = 0
+        while count is None or steps < count:
+            if switch is not None and switch.value == value:
+                return steps
+            if time.monotonic_ns() >= deadline:
+                self.onestep(direction=direction, style=style)
+                steps += 1
+                deadline += interval
+        if switch is not None and switch.value != value:
+            raise RuntimeError("Limit switch not reached")
+        return steps
+
+    def home(
+        self,
+        switch: DigitalInOut,
+        *,
+        direction: int = BACKWARD,
+        fast_speed: float,
+        slow_speed: float,
+        backoff: int,
+        style: int = SINGLE,
+        pressed: bool = False,
+        max_steps: Optional[int] = None,
+    ) -> int:
+        """Finds the home position against a limit switch. The motor moves toward the switch at
+        ``fast_speed`` until it is pressed, backs off until it is released and at least
+        ``backoff`` steps away, then approaches again at ``slow_speed`` for a precise stop. The
+        switch is read between every step. The `position` where it is pressed again becomes 0.
+
+        .. code-block:: python
+
+            switch = digitalio.DigitalInOut(board.D5)
+            switch.pull = digitalio.Pull.UP
+            motor.home(switch, fast_speed=400, slow_speed=50, backoff=20)
+
+        :param ~digitalio.DigitalInOut switch: The limit switch. Anything with a ``value`` works.
+        :param int direction: Direction of the switch, either `FORWARD` or `BACKWARD`
+        :param float fast_speed: Speed of the first approach in steps per second
+        :param float slow_speed: Speed of the back off and the second approach in steps per
+          second
+        :param int backoff: Number of steps to back off after the first approach
+        :param int style: `SINGLE`, `DOUBLE`, `INTERLEAVE` or `MICROSTEP`
+        :param bool pressed: The switch ``value`` when it is pressed. The default of ``False``
+          suits a switch to ground with a pull-up.
+        :param int max_steps: Maximum number of steps of each approach and of the back off, or
+          ``None`` for no limit. `RuntimeError` is raised if the switch does not change in time.
+        :return: The number of steps travelled"""
+        away = FORWARD if direction == BACKWARD else BACKWARD
+        self.stop()
+        steps = self._step_until(switch, pressed, max_steps, direction, style, fast_speed)
+        released = self._step_until(switch, not pressed, max_steps, away, style, slow_speed)
+        steps += released
+        if released < backoff:
+            steps += self._step_until(None, False, backoff - released, away, style, slow_speed)
+        steps += self._step_until(switch, pressed, max_steps, direction, style, slow_speed)
+        self.position = 0
+        return steps
+
+    async def move(
+        self,
+        steps: int,
+        *,
+        direction: int = FORWARD,
+        style: int = SINGLE,
+        speed: float,
+        acceleration: Optional[float] = None,
+        profile: int = TRAPEZOIDAL,
+    ) -> int:
+        """Performs a move like `schedule` as an `asyncio` coroutine, sleeping between steps so
+        other tasks can run. The move ends early if `stop` is called.
+
+        :param int steps: Number of steps to perform. Must not be negative.
+        :param int direction: Either `FORWARD` or `BACKWARD`
+        :param int style: `SINGLE`, `DOUBLE`, `INTERLEAVE` or `MICROSTEP`
+        :param float speed: Speed in steps per second. The top speed when ``acceleration`` is set.
+        :param float acceleration: Acceleration in steps per second squared, or ``None`` to move
+          at a constant ``speed``.
+        :param int profile: `TRAPEZOIDAL` or `S_CURVE`. See `step_intervals`.
+        :return: The current microstep"""
+        import asyncio
+
+        self.schedule(
+            steps,
+            direction=direction,
+            style=style,
+            speed=speed,
+            acceleration=acceleration,
+            profile=profile,
+        )
+        while self.update():
+            await asyncio.sleep(max(0, self._next_step_ns - time.monotonic_ns()) / 1000000000)
+        return self._current_microstep
+
+
+class MultiStepper:
+    """Moves several `StepperMotor` objects together so that they start and finish at the same
+    time, such as the axes of an XY plotter. The steps of each axis are spread evenly across the
+    move with Bresenham's line algorithm, so the path is a straight line instead of a staircase.
+
+    :param StepperMotor motors: One motor per axis"""
+
+    def __init__(self, *motors: StepperMotor) -> None:
+        self._motors = motors
+        self._directions = [FORWARD] * len(motors)
+        self._counts = [0] * len(motors)
+        self._errors = [0] * len(motors)
+        self._major = 0
+        self._style = SINGLE
+        # The move being played back by update().
+        self._intervals = None
+        self._next_step_ns = 0
+
+    def _start(self, deltas: Tuple[int, ...], style: int) -> int:
+        if len(deltas) != len(self._motors):
+            raise ValueError("Need one step count per motor")
+        for i, delta in enumerate(deltas):
+            self._directions[i] = FORWARD if delta >= 0 else BACKWARD
+            self._counts[i] = abs(delta)
+            self._errors[i] = 0
+        self._major = max(self._counts, default=0)
+        self._style = style
+        return self._major
+
+    def _tick(self) -> None:
+        major = self._major
+        counts = self._counts
+        errors = self._errors
+        for i, motor in enumerate(self._motors):
+            error = errors[i] + counts[i]
+            if 2 * error >= major:
+                error -= major
+                motor.onestep(direction=self._directions[i], style=self._style)
+            errors[i] = error
+
+    def step(self, deltas: Tuple[int, ...], *, style: int = SINGLE) -> None:
+        """Moves every motor by its number of steps in ``deltas`` right away.
+
+        :param deltas: Steps for each motor, negative to move `BACKWARD`
+        :param int style: `SINGLE`, `DOUBLE`, `INTERLEAVE` or `MICROSTEP`"""
+        self._intervals = None
+        for _ in range(self._start(deltas, style)):
+            self._tick()
+
+    def schedule(
+        self,
+        deltas: Tuple[int, ...],
+        *,
+        style: int = SINGLE,
+        speed: float,
+        acceleration: Optional[float] = None,
+        profile: int = TRAPEZOIDAL,
+    ) -> None:
+        """Starts a move that is played back by calling `update` from the main loop. ``speed``
+        and ``acceleration`` apply to the motor with the most steps. Any move in progress is
+        replaced.
+
+        :param deltas: Steps for each motor, negative to move `BACKWARD`
+        :param int style: `SINGLE`, `DOUBLE`, `INTERLEAVE` or `MICROSTEP`
+        :param float speed: Speed in steps per second. The top speed when ``acceleration`` is set.
+        :param float acceleration: Acceleration in steps per second squared, or ``None`` to move
+          at a constant ``speed``.
+        :param int profile: `TRAPEZOIDAL` or `S_CURVE`. See `step_intervals`."""
+        major = self._start(deltas, style)
+        intervals = _move_intervals(major, speed, acceleration, profile)
+        first_interval = next(intervals, None)
+        if first_interval is None:
+            self._intervals = None
+            return
+        self._intervals = intervals
+        self._next_step_ns = time.monotonic_ns() + first_interval
+
+    def update(self, now: Optional[int] = None) -> bool:
+        """Steps the motors that are due in the scheduled move. Call this as often as possible
+        from the main loop.
+
+        :param int now: The current `time.monotonic_ns`, to share one reading between motors
+        :return: ``True`` while the move is in progress"""
+        if self._intervals is None:
+            return False
+        if now is None:
+            now = time.monotonic_ns()
+        if now < self._next_step_ns:
+            return True
+        self._tick()
+        interval = next(self._intervals, None)
+        if interval is None:
+            self._intervals = None
+            return False
+        self._next_step_ns += interval
+        return True
+
+    @property
+    def is_moving(self) -> bool:
+        """``True`` while a scheduled move has steps left."""
+        return self._intervals is not None
+
+    def stop(self) -> None:
+        """Abandons the scheduled move. The coils stay energized to hold position."""
+        self._intervals = None
+
+
+class MotionQueue:
+    """A fixed size queue of constant speed moves for a `StepperMotor` that is played back by
+    calling `update` from the main loop. Moves can be added while earlier ones play, so a host
+    can stream them in. Storage is allocated up front and nothing is allocated during playback.
+
+    With ``acceleration`` set, the speed ramps between moves and looks ahead over the queued
+    moves, so the motor only slows down as much as the junctions and the moves after them need,
+    or to a stop at the end of the queue.
+
+    :param StepperMotor motor: The motor to move
+    :param int capacity: Maximum number of queued moves
+    :param float acceleration: Acceleration in steps per second squared, or ``None`` to change
+      speed instantly between moves"""
+
+    def __init__(
+        self, motor: StepperMotor, capacity: int = 16, *, acceleration: Optional[float] = None
+    ) -> None:
+        if capacity < 1:
+            raise ValueError("Capacity must be at least 1")
+        if acceleration is not None and acceleration <= 0:
+            raise ValueError("Acceleration must be positive")
+        self._motor = motor
+        self._steps = array("L", [0] * capacity)
+        self._intervals = array("L", [0] * capacity)
+        self._directions = bytearray(capacity)
+        self._styles = bytearray(capacity)
+        self._head = 0
+        self._count = 0
+        # Steps left in the move at the head of the queue.
+        self._left = 0
+        self._next_step_ns = 0
+        self._acceleration = acceleration
+        if acceleration is not None:
+            # The speed of the first step from a stop, see step_intervals.
+            self._start_speed = (acceleration / 2) ** 0.5 / 0.676
+        # Current speed in steps per second, 0 when stopped.
+        self._speed = 0.0
+        # Fastest speed to leave the head move at so every queued move after it can still slow
+        #  down in time, see _plan.
+        self._exit_speed = 0.0
+        self.underruns = 0
+        """Number of times the queue ran out of moves and the motor stopped.
+
+        :type: int
+        """
+
+    @property
+    def depth(self) -> int:
+        """Number of queued moves, including the one playing."""
+        return self._count
+
+    @property
+    def capacity(self) -> int:
+        """Maximum number of queued moves."""
+        return len(self._steps)
+
+    def push(
+        self, steps: int, *, direction: int = FORWARD, style: int = SINGLE, speed: float
+    ) -> bool:
+        """Adds a move to the end of the queue.
+
+        :param int steps: Number of steps to perform. Must not be negative.
+        :param int direction: Either `FORWARD` or `BACKWARD`
+        :param int style: `SINGLE`, `DOUBLE`, `INTERLEAVE` or `MICROSTEP`
+        :param float speed: Speed in steps per second. Must be at least 0.25 so the step interval
+          fits the queue's 32-bit storage.
+        :return: ``False`` if the queue is full and the move was not added"""
+        if steps < 0:
+            raise ValueError("Step count must not be negative")
+        if speed < _MIN_QUEUE_SPEED:
+            raise ValueError("Speed must be at least 0.25 steps per second")
+        if steps == 0:
+            return True
+        capacity = len(self._steps)
+        if self._count == capacity:
+            return False
+        tail = (self._head + self._count) % capacity
+        self._steps[tail] = steps
+        self._intervals[tail] = int(1000000000 / speed)
+        self._directions[tail] = direction
+        self._styles[tail] = style
+        self._count += 1
+        if self._count == 1:
+            self._left = steps
+            self._next_step_ns = time.monotonic_ns() + self._next_interval()
+        else:
+            self._plan()
+        return True
+
+    def clear(self) -> None:
+        """Abandons all queued moves. The coils stay energized to hold position."""
+        self._count = 0
+        self._speed = 0.0
+        self._exit_speed = 0.0
+
+    def update(self, now: Optional[int] = None) -> bool:
+        """Performs the next step if it is due. Call this as often as possible from the main
+        loop.
+
+        :param int now: The current `time.monotonic_ns`, to share one reading between motors
+        :return: ``True`` while moves are queued"""
+        if self._count == 0:
+            return False
+        if now is None:
+            now = time.monotonic_ns()
+        if now < self._next_step_ns:
+            return True
+        head = self._head
+        self._motor.onestep(direction=self._directions[head], style=self._styles[head])
+        self._left -= 1
+        if self._left == 0:
+            self._count -= 1
+            self._head = (head + 1) % len(self._steps)
+            if self._count == 0:
+                self._speed = 0.0
+                self.underruns += 1
+                return False
+            self._left = self._steps[self._head]
+            self._plan()
+        self._next_step_ns += self._next_interval()
+        return True
+
+    def _next_interval(self) -> int:
+        head = self._head
+        acceleration = self._acceleration
+        if acceleration is None:
+            return self._intervals[head]
+        target = 1000000000 / self._intervals[head]
+        speed = self._speed
+        if speed == 0:
+            speed = self._start_speed
+        elif speed < target:
+            speed = min(target, speed + acceleration / speed)
+        elif speed > target:
+            speed = max(target, speed - acceleration / speed)
+        # Look ahead so the motor can slow to the planned exit speed by the end of this move.
+        next_speed = self._exit_speed
+        if speed * speed > next_speed * next_speed + 2 * acceleration * self._left:
+            speed = min(speed, max(self._speed - acceleration / speed, next_speed))
+        speed = max(speed, min(self._start_speed, target))
+        self._speed = speed
+        return int(1000000000 / speed)
+
+    def _plan(self) -> None:
+        """Works back from a stop at the end of the queue to the fastest speed the head move can
+        end at. Each move is entered no faster than its own speed, nor faster than it can slow
+        down from in its steps, and moves stop between them if they turn the other way or take a
+        different style of step."""
+        acceleration = self._acceleration
+        if acceleration is None:
+            return
+        capacity = len(self._steps)
+        directions = self._directions
+        styles = self._styles
+        speed = 0.0
+        index = (self._head + self._count - 1) % capacity
+        for _ in range(self._count - 1):
+            previous = (index - 1) % capacity
+            if directions[index] != directions[previous] or styles[index] != styles[previous]:
+                speed = 0.0
+            else:
+                speed = min(
+                    1000000000 / self._intervals[index],
+                    (speed * speed + 2 * acceleration * self._steps[index]) ** 0.5,
+                )
+            index = previous
+        self._exit_speed = speed
@@ -0,0 +1,41 @@
+# SPDX-FileCopyrightText: 2026 Adafruit Industries
+# SPDX-License-Identifier: MIT
+
+# This example uses an Adafruit Stepper and DC Motor FeatherWing to run two Stepper Motors at the
+# same time without blocking the main loop.
+#   https://www.adafruit.com/product/2927
+
+import busio
+
+# Import the PCA9685 module. Available in the bundle and here:
+#   https://github.com/adafruit/Adafruit_CircuitPython_PCA9685
+from adafruit_pca9685 import PCA9685
+from board import SCL, SDA
+
+from adafruit_motor import stepper
+
+i2c = busio.I2C(SCL, SDA)
+
+# Create a simple PCA9685 class instance for the Motor FeatherWing's default address.
+pca = PCA9685(i2c, address=0x60)
+pca.frequency = 1600
+
+# Stepper 1 uses channels 3, 4, 5 and 6 with 2 and 7 held high.
+# Stepper 2 uses channels 9, 10, 11 and 12 with 8 and 13 held high.
+for channel in (2, 7, 8, 13):
+    pca.channels[channel].duty_cycle = 0xFFFF
+stepper1 = stepper.StepperMotor(pca.channels[4], pca.channels[3], pca.channels[5], pca.channels[6])
+stepper2 = stepper.StepperMotor(
+    pca.channels[10], pca.channels[9], pca.channels[11], pca.channels[12]
+)
+
+# Accelerate up to 100 steps per second and back down again, both motors at once.
+stepper1.schedule(400, speed=100, acceleration=200)
+stepper2.schedule(200, direction=stepper.BACKWARD, style=stepper.DOUBLE, speed=50)
+
+while stepper1.is_moving or stepper2.is_moving:
+    stepper1.update()
+    stepper2.update()
+    # Other work can be done here while the motors move.
+
+pca.deinit()
@@ -0,0 +1,329 @@
+# SPDX-FileCopyrightText: 2026 Adafruit Industries
+#
+# SPDX-License-Identifier: Unlicense
+
+"""
+`test_motor`
+====================================================
+
+Tests DC motor functionality.
+"""
+
+__version__ = "1.0.0"
+__repo__ = "https://github.com/adafruit/Adafruit_CircuitPython_Motor.git"
+
+import asyncio
+import os
+import sys
+
+# Fix up the path to include our neighboring module.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from adafruit_motor import motor
+
+
+class PWM:
+    """Class PWM"""
+
+    def __init__(self):
+        self._duty_cycle = 0
+        self.writes = 0
+
+    @property
+    def duty_cycle(self):
+        """16-bit duty cycle value"""
+        return self._duty_cycle
+
+    @duty_cycle.setter
+    def duty_cycle(self, value):
+        assert 0 <= value <= 0xFFFF
+        self._duty_cycle = value
+        self.writes += 1
+
+
+def test_throttle():
+    """Tests throttle in both decay modes"""
+    positive, negative = PWM(), PWM()
+    dc_motor = motor.DCMotor(positive, negative)
+    dc_motor.throttle = 0.5
+    assert (positive.duty_cycle, negative.duty_cycle) == (0x7FFF, 0)
+    dc_motor.throttle = -0.5
+    assert (positive.duty_cycle, negative.duty_cycle) == (0, 0x7FFF)
+    dc_motor.decay_mode = motor.SLOW_DECAY
+    dc_motor.throttle = 0.5
+    assert (positive.duty_cycle, negative.duty_cycle) == (0xFFFF, 0x8000)
+    dc_motor.throttle = 0
+    assert (positive.duty_cycle, negative.duty_cycle) == (0xFFFF, 0xFFFF)
+    dc_motor.throttle = None
+    assert (positive.duty_cycle, negative.duty_cycle) == (0, 0)
+
+
+def test_unchanged_pwm_not_written():
+    """Tests that only PWMs whose duty cycle changes are written"""
+    positive, negative = PWM(), PWM()
+    dc_motor = motor.DCMotor(positive, negative)
+    dc_motor.throttle = 0.5
+    dc_motor.throttle = 0.5
+    assert (positive.writes, negative.writes) == (1, 1)
+    dc_motor.throttle = 0.25
+    assert (positive.writes, negative.writes) == (2, 1)
+    dc_motor.resync()
+    assert (positive.writes, negative.writes) == (3, 2)
+
+
+def test_ramp_to():
+    """Tests ramping the throttle as an asyncio coroutine"""
+    positive, negative = PWM(), PWM()
+    dc_motor = motor.DCMotor(positive, negative)
+    asyncio.run(dc_motor.ramp_to(-1.0, 0.05))
+    assert dc_motor.throttle == -1.0
+    assert (positive.duty_cycle, negative.duty_cycle) == (0, 0xFFFF)
+    # Each change of the ramp is written.
+    assert negative.writes > 2
+
+
+def test_stats():
+    """Tests recording duty cycle updates and writes"""
+    positive, negative = PWM(), PWM()
+    dc_motor = motor.DCMotor(positive, negative)
+    stats = dc_motor.enable_stats()
+    dc_motor.throttle = 0.5
+    dc_motor.throttle = 0.5
+    dc_motor.throttle = -0.5
+    assert (stats.calls, stats.writes) == (3, 4)
+    assert stats.max_latency >= stats.min_latency > 0
+    dc_motor.disable_stats()
+    dc_motor.throttle = 1.0
+    assert (stats.calls, dc_motor.stats) == (3, None)
+
+
+def test_slew_rate():
+    """Tests slewing the throttle toward a target from update()"""
+    positive, negative = PWM(), PWM()
+    dc_motor = motor.DCMotor(positive, negative)
+    dc_motor.slew_rate = 2.0
+    dc_motor.target_throttle = 0.5
+    assert dc_motor.throttle is None
+    start = dc_motor._slewed_ns
+    assert dc_motor.update(start + 100000000)
+    assert dc_motor.throttle == 0.2
+    # Calls within one duty cycle step do not write.
+    writes = positive.writes
+    assert dc_motor.update(start + 100000001)
+    assert positive.writes == writes
+    assert not dc_motor.update(start + 300000000)
+    assert dc_motor.throttle == 0.5
+    assert (positive.duty_cycle, negative.duty_cycle) == (0x7FFF, 0)
+    assert not dc_motor.update()
+    # Reversing slews through zero.
+    dc_motor.target_throttle = -0.5
+    start = dc_motor._slewed_ns
+    dc_motor.update(start + 250000000)
+    assert dc_motor.throttle == 0.0
+    # Setting the throttle directly stops the ramp.
+    dc_motor.throttle = 1.0
+    assert dc_motor.target_throttle == 1.0
+    assert not dc_motor.update()
+    # Clearing the slew rate during a ramp jumps to the target.
+    dc_motor.target_throttle = 0.0
+    assert dc_motor.update(dc_motor._slewed_ns + 100000000)
+    dc_motor.slew_rate = None
+    assert dc_motor.throttle == 0.0
+    assert not dc_motor.update()
+
+
+def test_throttle_curve():
+    """Tests throttle lookup tables"""
+    positive, negative = PWM(), PWM()
+    dc_motor = motor.DCMotor(positive, negative)
+    dc_motor.set_throttle_curve(256)
+    # Without shaping, table steps match the exact duty cycles.
+    for throttle in (0.5, -0.25, 1.0, -1.0):
+        dc_motor.throttle = throttle
+        duty_cycles = (positive.duty_cycle, negative.duty_cycle)
+        dc_motor.set_throttle_curve(None)
+        dc_motor.throttle = throttle
+        assert (positive.duty_cycle, negative.duty_cycle) == duty_cycles
+        dc_motor.set_throttle_curve(256)
+    dc_motor.set_throttle_curve(4, deadband=0.25, min_duty=0.5)
+    dc_motor.throttle = 0.25
+    assert (positive.duty_cycle, negative.duty_cycle) == (0, 0)
+    dc_motor.throttle = -0.5
+    assert (positive.duty_cycle, negative.duty_cycle) == (0, int(0xFFFF * (0.5 + 0.5 / 3)))
+    dc_motor.throttle = 0
+    assert (positive.duty_cycle, negative.duty_cycle) == (0xFFFF, 0xFFFF)
+    # Changing the decay mode rebuilds the table.
+    dc_motor.decay_mode = motor.SLOW_DECAY
+    dc_motor.throttle = 0.99
+    assert (positive.duty_cycle, negative.duty_cycle) == (0xFFFF, 0xFFFF - int(0xFFFF * (5 / 6)))
+    dc_motor.set_throttle_curve(2, expo=1.0)
+    dc_motor.throttle = 0.5
+    assert (positive.duty_cycle, negative.duty_cycle) == (0xFFFF, 0xFFFF - 0xFFFF // 8)
+
+
+class BatchPWM(PWM):
+    """Class BatchPWM"""
+
+    batches = []
+
+    def set_duty_cycles(self, outputs, duty_cycles):
+        """Sets several duty cycles in one call"""
+        self.batches.append(len(outputs))
+        for output, duty_cycle in zip(outputs, duty_cycles):
+            output.duty_cycle = duty_cycle
+
+
+def test_differential_drive():
+    """Tests driving motors together"""
+    pwms = [PWM() for _ in range(4)]
+    left = motor.DCMotor(pwms[0], pwms[1])
+    right = motor.DCMotor(pwms[2], pwms[3])
+    drive = motor.DifferentialDrive(left, right, inverted=(False, True), trim=(1.0, 0.5))
+    drive.tank(0.5, 0.5)
+    assert [pwm.duty_cycle for pwm in pwms] == [0x7FFF, 0, 0, 0x3FFF]
+    assert (left.throttle, right.throttle) == (0.5, -0.25)
+    drive.arcade(1.0, 0.5)
+    assert (left.throttle, right.throttle) == (1.0, -(1 / 3) * 0.5)
+    drive.throttle = 0
+    assert [pwm.duty_cycle for pwm in pwms] == [0xFFFF] * 4
+    assert drive.throttle == 0
+    with drive:
+        pass
+    assert [pwm.duty_cycle for pwm in pwms] == [0] * 4
+
+
+class Driver:
+    """Driver of several PWM channels that writes them in batches"""
+
+    def __init__(self):
+        self.batches = []
+
+    def set_duty_cycles(self, outputs, duty_cycles):
+        """Sets several duty cycles in one call"""
+        self.batches.append(len(outputs))
+        for output, duty_cycle in zip(outputs, duty_cycles):
+            output.duty_cycle = duty_cycle
+
+    def channel(self):
+        """Returns a PWM channel of this driver"""
+        pwm = PWM()
+        pwm.set_duty_cycles = self.set_duty_cycles
+        return pwm
+
+
+def test_motor_group_batch_write():
+    """Tests that a group commits the motors on each driver in one batch write"""
+    drivers = (Driver(), Driver())
+    pwms = [drivers[i // 4].channel() for i in range(6)]
+    group = motor.MotorGroup(*(motor.DCMotor(pwms[i], pwms[i + 1]) for i in range(0, 6, 2)))
+    group.set_throttles((1.0, -1.0, 0.5))
+    group.set_throttles((1.0, -1.0, 0.5))
+    assert (drivers[0].batches, drivers[1].batches) == ([4], [2])
+    assert [pwm.duty_cycle for pwm in pwms] == [0xFFFF, 0, 0, 0xFFFF, 0x7FFF, 0]
+    group.set_throttles((1.0, 0.0, 0.5))
+    assert drivers[0].batches == [4, 4]
+    # Outputs of different drivers are never passed to one driver.
+    pwms = [BatchPWM() for _ in range(4)]
+    group = motor.MotorGroup(motor.DCMotor(pwms[0], pwms[1]), motor.DCMotor(pwms[2], pwms[3]))
+    BatchPWM.batches.clear()
+    group.set_throttles((1.0, -1.0))
+    assert BatchPWM.batches == [2, 2]
+
+
+class Encoder:
+    """Encoder on a motor that turns 1000 counts per second at full throttle, less a load"""
+
+    def __init__(self, dc_motor, load=0.0):
+        self._motor = dc_motor
+        self.load = load
+        self._position = 0.0
+
+    def run(self, seconds):
+        """Turns the motor for some time"""
+        self._position += 1000 * ((self._motor.throttle or 0) - self.load) * seconds
+
+    @property
+    def position(self):
+        """Count of the encoder"""
+        return int(self._position)
+
+
+def test_velocity_controller():
+    """Tests holding a speed under load"""
+    dc_motor = motor.DCMotor(PWM(), PWM())
+    encoder = Encoder(dc_motor, load=0.2)
+    controller = motor.VelocityController(dc_motor, encoder, kp=0.0005, ki=0.005)
+    assert not controller.update()
+    controller.target = 500
+    now = controller._next_ns
+    for _ in range(300):
+        encoder.run(0.01)
+        assert controller.update(now)
+        now += 10000000
+    assert abs(controller.velocity - 500) < 10
+    # The integral term makes up for the load.
+    assert 0.65 < dc_motor.throttle < 0.75
+    assert controller.loops == 300
+    assert controller.min_period == controller.max_period == controller.mean_period == 10000000
+    assert controller.overruns == 0
+    controller.update(now + 25000000)
+    assert controller.overruns == 1
+    # An unreachable target saturates the output without winding up the integral.
+    controller.target = 2000
+    now = controller._next_ns
+    for _ in range(300):
+        encoder.run(0.01)
+        controller.update(now)
+        now += 10000000
+    assert dc_motor.throttle == 1.0
+    controller.target = 300
+    for _ in range(20):
+        encoder.run(0.01)
+        controller.update(now)
+        now += 10000000
+    assert dc_motor.throttle < 1.0
+    controller.target = None
+    assert dc_motor.throttle is None
+    assert not controller.update()
+
+
+def test_position_controller():
+    """Tests moving to and settling at a position"""
+    dc_motor = motor.DCMotor(PWM(), PWM())
+    encoder = Encoder(dc_motor)
+    controller = motor.PositionController(
+        dc_motor, encoder, kp=0.01, max_velocity=400, tolerance=2, settle_time=0.05, hold=False
+    )
+    controller.move_to(500)
+    assert controller.is_moving
+    now = controller._next_ns
+    loops = 0
+    while controller.update(now):
+        encoder.run(0.01)
+        now += 10000000
+        loops += 1
+        # The velocity limit keeps the throttle down.
+        assert dc_motor.throttle <= 0.5
+    assert not controller.is_moving
+    assert abs(controller.position - 500) <= 2
+    # Most of the time is spent at the velocity limit.
+    assert 125 < loops < 200
+    # Without holding, the motor brakes and the loop stops.
+    assert dc_motor.throttle == 0
+    assert not controller.update()
+    controller.move_to(400)
+    assert controller.update()
+    controller.stop()
+    assert dc_motor.throttle is None
+
+
+def test_position_controller_move():
+    """Tests awaiting a move as an asyncio coroutine"""
+    dc_motor = motor.DCMotor(PWM(), PWM())
+    controller = motor.PositionController(dc_motor, Encoder(dc_motor), kp=0.01, settle_time=0.03)
+    assert asyncio.run(controller.move(0)) == 0
+    assert not controller.is_moving
+    # The position is still held.
+    assert dc_motor.throttle == 0
+    assert not controller.update()
+    assert controller._running
@@ -0,0 +1,54 @@
+# SPDX-FileCopyrightText: 2026 Adafruit Industries
+#
+# SPDX-License-Identifier: Unlicense
+
+"""
+`test_servo`
+====================================================
+
+Tests servo functionality.
+"""
+
+__version__ = "1.0.0"
+__repo__ = "https://github.com/adafruit/Adafruit_CircuitPython_Motor.git"
+
+import asyncio
+import os
+import sys
+
+# Fix up the path to include our neighboring module.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from adafruit_motor import servo
+
+
+class PWM:
+    """Class PWM"""
+
+    def __init__(self):
+        self.duty_cycle = 0
+        self.frequency = 50
+
+
+def test_sweep_to():
+    """Tests sweeping the angle as an asyncio coroutine"""
+    pwm = PWM()
+    servo_motor = servo.Servo(pwm)
+    # A disabled servo moves straight to the angle.
+    asyncio.run(servo_motor.sweep_to(90, 1.0))
+    assert round(servo_motor.angle) == 90
+    asyncio.run(servo_motor.sweep_to(180, 0.05))
+    assert round(servo_motor.angle) == 180
+
+
+def test_stats():
+    """Tests recording pulse width updates and writes"""
+    pwm = PWM()
+    servo_motor = servo.Servo(pwm)
+    stats = servo_motor.enable_stats()
+    servo_motor.angle = 90
+    servo_motor.angle = None
+    assert (stats.calls, stats.writes) == (2, 2)
+    assert servo_motor.angle is None
+    servo_motor.disable_stats()
+    assert servo_motor._pwm_out is pwm
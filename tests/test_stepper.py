@@ -14,8 +14,10 @@ Tests stepper functionality.
 __version__ = "1.0.0"
 __repo__ = "https://github.com/adafruit/Adafruit_CircuitPython_Motor.git"
 
+import asyncio
 import os
 import sys
+from array import array
 from unittest.mock import MagicMock
 
 # Fix up the path to include our neighboring module.
@@ -32,6 +34,7 @@ class Coil:
 
     def __init__(self):
         self._duty_cycle = 0
+        self.writes = 0
 
     @property
     def frequency(self):
@@ -47,6 +50,7 @@ class Coil:
     def duty_cycle(self, value):
         assert 0 <= value <= 0xFFFF
         self._duty_cycle = value
+        self.writes += 1
 
 
 def test_single_coil():
@@ -204,3 +208,535 @@ def test_microstep_to_single():
     assert coil[1].duty_cycle == 0
     assert coil[2].duty_cycle == 0
     assert coil[3].duty_cycle == 0
+
+
+def test_step_matches_onestep():
+    """Tests that multi-step moves leave the coils as repeated single steps would"""
+    for microsteps in (2, 16):
+        for style in (stepper.SINGLE, stepper.DOUBLE, stepper.INTERLEAVE, stepper.MICROSTEP):
+            for direction in (stepper.FORWARD, stepper.BACKWARD):
+                coil = (Coil(), Coil(), Coil(), Coil())
+                other = (Coil(), Coil(), Coil(), Coil())
+                motor = stepper.StepperMotor(*coil, microsteps=microsteps)
+                expected = stepper.StepperMotor(*other, microsteps=microsteps)
+                # Start off the interleave grid so the first step has to align.
+                motor.onestep(style=stepper.MICROSTEP)
+                expected.onestep(style=stepper.MICROSTEP)
+                for _ in range(7):
+                    position = expected.onestep(direction=direction, style=style)
+                assert motor.step(7, direction=direction, style=style) == position
+                for j in range(4):
+                    assert coil[j].duty_cycle == other[j].duty_cycle
+                assert motor.step(0, style=style) == position
+
+
+def test_tables_shared():
+    """Tests that motors with the same microsteps share one curve and frame table"""
+    motor = stepper.StepperMotor(Coil(), Coil(), Coil(), Coil(), microsteps=8)
+    other = stepper.StepperMotor(Coil(), Coil(), Coil(), Coil(), microsteps=8)
+    assert motor._full_frames is other._full_frames
+    assert motor._curve is other._curve
+    assert motor._curve.typecode == "H"
+    assert len(motor._curve) == 8 + 1
+    assert len(motor._microstep_frames) == 4 * 8
+    # Only a few tables are kept.
+    for microsteps in range(10, 30, 2):
+        stepper.StepperMotor(Coil(), Coil(), Coil(), Coil(), microsteps=microsteps)
+    assert len(stepper._TABLES) == stepper._MAX_TABLES
+    assert (8, stepper.SINE) not in stepper._TABLES
+    assert motor._curve[8] == 0xFFFF
+
+
+def test_unchanged_coils_not_written():
+    """Tests that only coils whose duty cycle changes are written"""
+    coil = (Coil(), Coil(), Coil(), Coil())
+    motor = stepper.StepperMotor(coil[2], coil[0], coil[1], coil[3])
+    assert [c.writes for c in coil] == [1, 1, 1, 1]
+    motor.onestep(style=stepper.DOUBLE)
+    assert [c.writes for c in coil] == [1, 2, 1, 1]
+    motor.release()
+    motor.release()
+    assert [c.writes for c in coil] == [2, 3, 1, 1]
+    motor.resync()
+    assert [c.writes for c in coil] == [3, 4, 2, 2]
+
+
+def test_batch_write():
+    """Tests that outputs with set_duty_cycles are written together"""
+    batches = []
+
+    class BatchCoil(Coil):
+        """Class BatchCoil"""
+
+        def set_duty_cycles(self, outputs, duty_cycles):
+            """Writes several outputs at once"""
+            batches.append(tuple(duty_cycles))
+            for output, duty_cycle in zip(outputs, duty_cycles):
+                output._duty_cycle = duty_cycle
+
+    coil = (BatchCoil(), BatchCoil(), BatchCoil(), BatchCoil())
+    motor = stepper.StepperMotor(coil[2], coil[0], coil[1], coil[3])
+    motor.onestep(style=stepper.DOUBLE)
+    motor.onestep(direction=stepper.BACKWARD, style=stepper.DOUBLE)
+    motor.release()
+    motor.release()
+    assert batches == [
+        (0xFFFF, 0, 0, 0),
+        (0xFFFF, 0xFFFF, 0, 0),
+        (0xFFFF, 0, 0, 0xFFFF),
+        (0, 0, 0, 0),
+    ]
+    assert [c.writes for c in coil] == [0, 0, 0, 0]
+
+
+def test_step_intervals():
+    """Tests trapezoidal and S-curve move profiles"""
+    for profile in (stepper.TRAPEZOIDAL, stepper.S_CURVE):
+        for steps in (0, 1, 2, 7, 10, 1000):
+            intervals = list(stepper.step_intervals(steps, 500, 1000, profile=profile))
+            assert len(intervals) == steps
+            if steps < 2:
+                continue
+            top = min(intervals)
+            assert top >= 2000000
+            peak = intervals.index(top)
+            # Speed up until the top speed then slow down again.
+            assert intervals[:peak] == sorted(intervals[:peak], reverse=True)
+            assert intervals[peak:] == sorted(intervals[peak:])
+            # Much faster than moving at the speed a motor can start from.
+            if steps == 1000:
+                assert sum(intervals) < steps * intervals[0] // 4
+                assert top == 2000000
+
+
+def test_s_curve_monotonic():
+    """Tests that S-curve moves only speed up and then only slow down"""
+    for max_speed in (1, 5, 43.7, 200, 1000, 4000):
+        for acceleration in (1, 10, 300.2, 3000, 50000):
+            for steps in (3, 50, 1776):
+                intervals = list(
+                    stepper.step_intervals(steps, max_speed, acceleration, profile=stepper.S_CURVE)
+                )
+                half = steps // 2
+                assert intervals[: half + 1] == sorted(intervals[: half + 1], reverse=True)
+                assert intervals[half:] == sorted(intervals[half:])
+                assert min(intervals) >= int(1000000000 / max_speed)
+    # A short ramp reaches top speed smoothly instead of jumping to it.
+    speeds = [
+        1000000000 / i for i in stepper.step_intervals(1776, 43.7, 300.2, profile=stepper.S_CURVE)
+    ]
+    assert speeds[1] > speeds[0] * 1.2
+    assert speeds[2] < 43
+    # Moves too short to reach top speed still ease over their whole length.
+    for steps, max_speed, acceleration in ((4000, 2000, 100), (200, 1000, 1000), (10, 500, 1000)):
+        times = [
+            sum(stepper.step_intervals(steps, max_speed, acceleration, profile=profile))
+            for profile in (stepper.TRAPEZOIDAL, stepper.S_CURVE)
+        ]
+        assert times[1] < 2.5 * times[0]
+
+
+def test_scheduled_move():
+    """Tests that scheduled steps happen only once due"""
+    coil = (Coil(), Coil(), Coil(), Coil())
+    motor = stepper.StepperMotor(*coil)
+    motor.schedule(3, speed=1000)
+    start = motor._next_step_ns - 1000000
+    assert motor.update(start + 999999)
+    assert motor._current_microstep == 0
+    assert motor.update(start + 1000000)
+    assert motor._current_microstep == 16
+    # A late update is caught up by the next one.
+    assert motor.update(start + 2500000)
+    assert motor.update(start + 3000000) is False
+    assert motor._current_microstep == 48
+    assert not motor.is_moving
+    assert motor.update() is False
+
+    motor.schedule(100, direction=stepper.BACKWARD, speed=1000, acceleration=5000)
+    assert motor.is_moving
+    while motor.update(motor._next_step_ns):
+        pass
+    assert motor._current_microstep == 48 - 100 * 16
+
+
+def test_async_move():
+    """Tests moving as an asyncio coroutine"""
+    coil = (Coil(), Coil(), Coil(), Coil())
+    motor = stepper.StepperMotor(*coil)
+    position = asyncio.run(motor.move(20, style=stepper.DOUBLE, speed=2000, acceleration=100000))
+    assert position == 8 + 19 * 16
+    assert not motor.is_moving
+
+
+def test_multi_stepper():
+    """Tests that coordinated axes arrive together along a straight line"""
+    x_axis = stepper.StepperMotor(Coil(), Coil(), Coil(), Coil(), microsteps=2)
+    y_axis = stepper.StepperMotor(Coil(), Coil(), Coil(), Coil(), microsteps=2)
+    axes = stepper.MultiStepper(x_axis, y_axis)
+    axes.step((10, -4), style=stepper.MICROSTEP)
+    assert (x_axis._current_microstep, y_axis._current_microstep) == (10, -4)
+
+    axes.schedule((-5, 15), style=stepper.MICROSTEP, speed=1000)
+    path = []
+    while axes.update(axes._next_step_ns):
+        path.append((x_axis._current_microstep, y_axis._current_microstep))
+    path.append((x_axis._current_microstep, y_axis._current_microstep))
+    assert len(path) == 15
+    assert path[-1] == (5, 11)
+    for i, (x, y) in enumerate(path):
+        # Never more than half a step away from the ideal line.
+        assert y == -4 + i + 1
+        assert abs((x - 10) - (-5 * (i + 1) / 15)) <= 0.5
+
+
+def test_position():
+    """Tests position tracking and absolute moves"""
+    motor = stepper.StepperMotor(Coil(), Coil(), Coil(), Coil(), microsteps=8)
+    motor.onestep(style=stepper.MICROSTEP)
+    motor.onestep(style=stepper.DOUBLE)
+    assert motor.position == 12
+    assert motor.full_steps == 1.5
+    motor.position = 0
+    assert motor.position == 0
+    assert motor._current_microstep == 12
+
+    # Whole steps of the style first, then microsteps for the rest.
+    assert motor.move_to(21, style=stepper.DOUBLE) == 21
+    assert motor._current_microstep == 33
+    assert motor.move_by(-18, style=stepper.INTERLEAVE) == 3
+    assert motor.move_to(3, style=stepper.SINGLE) == 3
+
+    motor.schedule(5, direction=stepper.BACKWARD, style=stepper.SINGLE, speed=100)
+    assert motor.target == 3 - 7 - 4 * 8
+    while motor.update(motor._next_step_ns):
+        assert motor.distance_to_go == motor.target - motor.position
+    assert motor.position == 3 - 7 - 4 * 8
+    assert motor.distance_to_go == 0
+
+    motor = stepper.StepperMotor(Pin(), Pin(), Pin(), Pin(), microsteps=None)
+    motor.step(4, style=stepper.INTERLEAVE)
+    assert (motor.position, motor.full_steps) == (4, 2)
+    motor.step(3, style=stepper.SINGLE)
+    assert (motor.position, motor.full_steps) == (7, 7)
+
+
+def test_iter_frames():
+    """Tests generating coil frames without writing the coils"""
+    coil = (Coil(), Coil(), Coil(), Coil())
+    other = (Coil(), Coil(), Coil(), Coil())
+    motor = stepper.StepperMotor(*coil, microsteps=4)
+    expected = stepper.StepperMotor(*other, microsteps=4)
+    frames = list(motor.iter_frames(6, style=stepper.MICROSTEP))
+    assert [c.writes for c in coil] == [1, 1, 1, 1]
+    for frame in frames:
+        expected.onestep(style=stepper.MICROSTEP)
+        assert frame == tuple(c.duty_cycle for c in other)
+    assert motor.position == 6
+
+    buffer = array("H", bytes(2 * 4 * 3))
+    assert motor.pack_frames(buffer, 5, direction=stepper.BACKWARD, style=stepper.DOUBLE) == 3
+    for i in range(3):
+        expected.onestep(direction=stepper.BACKWARD, style=stepper.DOUBLE)
+        assert tuple(buffer[4 * i : 4 * i + 4]) == tuple(c.duty_cycle for c in other)
+    # Resyncing writes the frame the motor was left at.
+    motor.resync()
+    expected.resync()
+    assert [c.duty_cycle for c in coil] == [c.duty_cycle for c in other]
+    assert [c.writes for c in coil] == [2, 2, 2, 2]
+    list(motor.iter_frames(1, style=stepper.MICROSTEP))
+    expected.onestep(style=stepper.MICROSTEP)
+    motor.resync()
+    assert [c.duty_cycle for c in coil] == [c.duty_cycle for c in other]
+    # The next write rewrites every coil.
+    list(motor.iter_frames(1, direction=stepper.BACKWARD, style=stepper.DOUBLE))
+    motor.onestep(direction=stepper.BACKWARD, style=stepper.DOUBLE)
+    assert [c.writes for c in coil] == [4, 4, 4, 4]
+
+
+def test_unsupported_style():
+    """Tests that unknown step styles are rejected"""
+    motor = stepper.StepperMotor(Coil(), Coil(), Coil(), Coil())
+    try:
+        motor.onestep(style=5)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Expected ValueError")
+    assert motor.position == 0
+
+
+def test_curves():
+    """Tests built-in and user supplied microstep curves"""
+    coil = (Coil(), Coil(), Coil(), Coil())
+    motor = stepper.StepperMotor(*coil, microsteps=4, curve=stepper.LINEAR)
+    assert list(motor._curve) == [0, 0x3FFF, 0x7FFF, 0xBFFF, 0xFFFF]
+    motor = stepper.StepperMotor(*coil, microsteps=4, curve=stepper.TORQUE_COMPENSATED)
+    assert list(motor._curve) == [0, 0x6A09, 0xFFFF, 0xFFFF, 0xFFFF]
+
+    motor = stepper.StepperMotor(*coil, microsteps=2, curve=[0, 0x4000, 0x8000])
+    motor.onestep(style=stepper.MICROSTEP)
+    assert [c.duty_cycle for c in coil] == [0, 0x4000, 0x4000, 0]
+    motor.onestep(style=stepper.MICROSTEP)
+    assert [c.duty_cycle for c in coil] == [0, 0, 0x8000, 0]
+    # Full torque steps are limited by the curve too.
+    motor.onestep(style=stepper.DOUBLE)
+    assert sorted(c.duty_cycle for c in coil) == [0, 0, 0x8000, 0x8000]
+    motor.onestep(style=stepper.INTERLEAVE)
+    assert sorted(c.duty_cycle for c in coil) == [0, 0, 0, 0x8000]
+
+    for curve in ([0, 1], [1, 2, 3], [0, 3, 2], [0, 1, 0x10000], 5):
+        try:
+            stepper.StepperMotor(*coil, microsteps=2, curve=curve)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("Expected ValueError")
+
+
+class Pin:
+    """Class Pin"""
+
+    def __init__(self):
+        self._value = False
+        self.writes = 0
+
+    @property
+    def value(self):
+        """Digital output value"""
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        self._value = value
+        self.writes += 1
+
+
+def test_digital_pins():
+    """Tests stepping digital pins and writing only the pins that change"""
+    pin = (Pin(), Pin(), Pin(), Pin())
+    motor = stepper.StepperMotor(*pin, microsteps=None)
+    assert [p.value for p in pin] == [False] * 4
+    for i in range(1, 9):
+        motor.onestep(style=stepper.INTERLEAVE)
+        bits = stepper._INTERLEAVE_STEPS[i % 8]
+        assert [p.value for p in pin] == [bool(bits >> j & 1) for j in range(4)]
+    # Each interleave step changes a single pin.
+    assert [p.writes for p in pin] == [3, 4, 3, 2]
+    motor.resync()
+    assert [p.writes for p in pin] == [4, 5, 4, 3]
+    bits = list(motor.iter_frames(2, style=stepper.INTERLEAVE))[-1]
+    motor.resync()
+    assert [p.value for p in pin] == [bool(bits >> j & 1) for j in range(4)]
+
+    written = []
+    motor = stepper.StepperMotor(*pin, microsteps=None, port_writer=written.append)
+    motor.step(3, style=stepper.DOUBLE)
+    motor.release()
+    motor.release()
+    assert written == [0b0000, 0b0110, 0b0101, 0b1001, 0b0000]
+
+
+def test_adaptive_microsteps():
+    """Tests switching to coarser steps at high speed without losing phase"""
+    coil = (Coil(), Coil(), Coil(), Coil())
+    motor = stepper.StepperMotor(*coil, microsteps=16)
+    motor.interleave_speed = 4000
+    motor.double_speed = 8000
+    assert motor.double_speed == 8000
+    motor.move_by(3)
+    motor.schedule(2000, style=stepper.MICROSTEP, speed=12000, acceleration=40000)
+    sizes = []
+    while True:
+        before = motor.position
+        moving = motor.update(motor._next_step_ns)
+        sizes.append(motor.position - before)
+        if abs(sizes[-1]) > 1:
+            # Coarse steps stay on the half step grid and keep the microstep current.
+            assert motor._current_microstep % 8 == 0
+            assert max(c.duty_cycle for c in coil) < 0xFFFF or motor._current_microstep % 16 == 0
+        if not moving:
+            break
+    assert motor.position == 2003
+    assert set(sizes) == {1, 8, 16}
+    assert len(sizes) < 2000 // 3
+    # Slowing down returns to microsteps.
+    assert sizes[-1] == 1
+
+
+def test_spin():
+    """Tests spinning continuously at an exact long-run rate"""
+    motor = stepper.StepperMotor(Coil(), Coil(), Coil(), Coil(), steps_per_rev=200)
+    motor.spin(-1000, style=stepper.INTERLEAVE)
+    assert motor.rpm == -150
+    start = motor._next_step_ns - 1000000
+    now = start
+    while now < start + 100000000:
+        now += 700000 if now % 3 else 1300000
+        assert motor.update(now)
+    assert motor.position == -100 * 8
+    assert motor.is_moving
+    assert motor.target == motor.position
+
+    motor.rpm = 30
+    assert motor.velocity == 200
+    motor.stop()
+    assert not motor.update()
+    assert motor.velocity == 0
+
+
+def test_motion_queue():
+    """Tests blending queued moves"""
+    motor = stepper.StepperMotor(Coil(), Coil(), Coil(), Coil(), microsteps=2)
+    queue = stepper.MotionQueue(motor, 2, acceleration=20000)
+    assert queue.push(300, speed=1000)
+    assert queue.push(200, speed=500)
+    assert not queue.push(100, speed=1000)
+    assert (queue.depth, queue.capacity) == (2, 2)
+    speeds = []
+    while queue.update(queue._next_step_ns):
+        speeds.append(queue._speed)
+        if len(speeds) == 400:
+            assert queue.push(100, speed=2000)
+    assert motor.position == (300 + 200 + 100) * 2
+    assert queue.underruns == 1
+    assert queue.depth == 0
+    # Cruising speeds are reached, a faster next move does not speed up the current one and
+    # junctions do not stop.
+    assert max(speeds[:300]) == 1000
+    assert speeds.count(500) > 100
+    assert min(speeds[10:-10]) > queue._start_speed
+    assert not queue.update()
+
+
+def test_motion_queue_reversal():
+    """Tests that queued moves stop before reversing"""
+    motor = stepper.StepperMotor(Coil(), Coil(), Coil(), Coil(), microsteps=2)
+    queue = stepper.MotionQueue(motor, 2, acceleration=20000)
+    queue.push(300, speed=1000)
+    queue.push(100, direction=stepper.BACKWARD, speed=2000)
+    speeds = []
+    while queue.update(queue._next_step_ns):
+        speeds.append(queue._speed)
+    assert motor.position == (300 - 100) * 2
+    assert max(speeds[:300]) == 1000
+    # The last forward step is as slow as the ramp allows.
+    assert speeds[298] == min(speeds[250:350])
+    assert speeds[298] < 400
+    try:
+        queue.push(10, speed=0.2)
+    except ValueError:
+        pass
+    else:
+        assert False, "Expected ValueError"
+
+
+def test_motion_queue_short_move():
+    """Tests slowing down ahead of a move too short to stop in"""
+    motor = stepper.StepperMotor(Coil(), Coil(), Coil(), Coil())
+    runs = []
+    for moves in ((2000, 3, 1), (2004,)):
+        queue = stepper.MotionQueue(motor, acceleration=1000)
+        for steps in moves:
+            queue.push(steps, speed=1000)
+        speeds = []
+        while queue.update(queue._next_step_ns):
+            speeds.append(queue._speed)
+        runs.append(speeds)
+    assert motor.position == 2 * 2004 * 16
+    assert max(runs[0]) == 1000
+    # The short moves at the end slow down just like one long move ending there.
+    assert runs[0] == runs[1]
+
+
+def test_stats():
+    """Tests recording coil updates, writes and step lateness"""
+    coil = (Coil(), Coil(), Coil(), Coil())
+    motor = stepper.StepperMotor(*coil)
+    assert motor.stats is None
+    stats = motor.enable_stats(jitter_bins=4, jitter_bin_width=1000)
+    motor.onestep()
+    motor.step(3, style=stepper.DOUBLE)
+    assert stats.calls == 4
+    # The first coil update in the constructor wrote all four coils.
+    assert stats.writes == sum(c.writes for c in coil) - 4
+    assert 0 < stats.min_latency <= stats.mean_latency <= stats.max_latency
+    motor.schedule(3, speed=1000)
+    due = motor._next_step_ns
+    motor.update(due)
+    motor.update(motor._next_step_ns + 1500)
+    motor.update(motor._next_step_ns + 1000000)
+    assert list(stats.jitter) == [1, 1, 0, 1]
+    stats.reset()
+    assert (stats.calls, stats.writes, stats.min_latency, sum(stats.jitter)) == (0, 0, None, 0)
+    motor.disable_stats()
+    assert motor.stats is None
+    assert "_update_coils" not in motor.__dict__
+    motor.onestep()
+    assert stats.calls == 0
+
+
+class Switch:
+    """Limit switch that is pressed at and below a position"""
+
+    def __init__(self, motor, position):
+        self._motor = motor
+        self._position = position
+
+    @property
+    def value(self):
+        """True when pressed"""
+        return self._motor.position <= self._position
+
+
+def test_home():
+    """Tests homing against a limit switch"""
+    motor = stepper.StepperMotor(Coil(), Coil(), Coil(), Coil(), microsteps=2)
+    switch = Switch(motor, -20)
+    # 10 steps to the switch, 1 to release it and 2 more of back off, then 3 steps back.
+    steps = motor.home(switch, fast_speed=100000, slow_speed=50000, backoff=3, pressed=True)
+    assert steps == 10 + 3 + 3
+    assert motor.position == 0
+    assert motor._current_microstep == -20
+    switch._position = -1000
+    try:
+        motor.home(
+            switch, fast_speed=100000, slow_speed=50000, backoff=3, pressed=True, max_steps=5
+        )
+    except RuntimeError:
+        pass
+    else:
+        assert False, "Expected RuntimeError"
+    assert motor.position == -5 * 2
+
+
+def test_hold_current():
+    """Tests reducing the coil current while idle"""
+    coil = (Coil(), Coil(), Coil(), Coil())
+    motor = stepper.StepperMotor(coil[2], coil[0], coil[1], coil[3])
+    motor.hold_current = 0.25
+    motor.hold_delay = 0.001
+    motor.onestep(style=stepper.DOUBLE)
+    assert not motor.update(0)
+    motor.update(500000)
+    assert [c.duty_cycle for c in coil] == [0xFFFF, 0xFFFF, 0, 0]
+    motor.update(1000000)
+    assert [c.duty_cycle for c in coil] == [0x3FFF, 0x3FFF, 0, 0]
+    writes = [c.writes for c in coil]
+    motor.update(2000000)
+    assert [c.writes for c in coil] == writes
+    # The next step is at full current and restarts the delay.
+    motor.onestep(style=stepper.DOUBLE)
+    assert [c.duty_cycle for c in coil] == [0, 0xFFFF, 0xFFFF, 0]
+    motor.update(3000000)
+    motor.update(3500000)
+    assert [c.duty_cycle for c in coil] == [0, 0xFFFF, 0xFFFF, 0]
+    motor.update(4000000)
+    assert [c.duty_cycle for c in coil] == [0, 0x3FFF, 0x3FFF, 0]
+    assert motor.hold_current == 0.25
+    # Frames streamed by other means are held too.
+    list(motor.iter_frames(1, style=stepper.DOUBLE))
+    # Only once, however long the motor stays idle.
+    for now in range(5000000, 10000000, 500000):
+        motor.update(now)
+    assert [c.duty_cycle for c in coil] == [0, 0, 0x3FFF, 0x3FFF]